@@ -0,0 +1,75 @@
+import json
+import sqlite3
+import threading
+from cache import LRUCache
+
+class AnalysisCache:
+    """
+    Content-addressed cache of building analysis results
+    Results are keyed by the SHA-256 of the uploaded bytes and held in a
+    bounded LRU, optionally backed by a SQLite file shared across workers
+    and restarts. Cached values are shared; callers must not mutate them.
+    """
+    
+    def __init__(self, maxsize=1024, db_path=None, namespace=''):
+        """namespace: folded into every key, e.g. analyzer settings that change results"""
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._memory = LRUCache(maxsize)
+        self._db = None
+        self._db_lock = threading.Lock()
+        
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS analysis (key TEXT PRIMARY KEY, result TEXT NOT NULL)'
+            )
+            self._db.commit()
+    
+    def _key(self, digest):
+        return f'{self.namespace}:{digest}' if self.namespace else digest
+    
+    def get(self, digest):
+        """Return the cached result for an upload digest, or None"""
+        key = self._key(digest)
+        result = self._memory.get(key)
+        
+        if result is None and self._db is not None:
+            with self._db_lock:
+                row = self._db.execute('SELECT result FROM analysis WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                result = json.loads(row[0])
+                self._memory.put(key, result)
+                self.disk_hits += 1
+        
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        
+        return result
+    
+    def put(self, digest, result):
+        key = self._key(digest)
+        self._memory.put(key, result)
+        
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO analysis (key, result) VALUES (?, ?)', (key, json.dumps(result))
+                )
+                self._db.commit()
+    
+    def stats(self):
+        """Hit/miss counters for sizing the cache"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'disk_hits': self.disk_hits,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'memory': self._memory.stats(),
+            'persistent': self._db is not None
+        }
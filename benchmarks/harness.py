@@ -0,0 +1,119 @@
+"""
+Timing, memory and baseline-comparison helpers shared by the benchmarks
+plus synthetic generators for sample locations, images and coordinates.
+"""
+import io
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+
+# Bounding box roughly covering India, the region of the sample dataset
+REGION = (6.0, 36.0, 68.0, 97.0)
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 4)
+
+def measure(fn, iterations=200, warmup=10, items=1):
+    """
+    Time fn(i) for i in range(iterations) after warmup calls
+    items: work units per call (e.g. coordinates per batch) for throughput.
+    Peak memory is taken from one extra traced call, so tracemalloc overhead
+    never leaks into the latency figures.
+    """
+    for i in range(warmup):
+        fn(i)
+    
+    samples = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(warmup + i)
+        samples[i] = time.perf_counter() - start
+    
+    tracemalloc.start()
+    try:
+        fn(warmup + iterations)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    total = float(samples.sum())
+    return {
+        'iterations': iterations,
+        'items_per_call': items,
+        'throughput_per_s': round(iterations * items / total, 2) if total else None,
+        'mean_ms': round(total / iterations * 1000, 4),
+        'p50_ms': percentile_ms(samples, 50),
+        'p99_ms': percentile_ms(samples, 99),
+        'peak_mem_kb': round(peak / 1024, 1)
+    }
+
+def environment():
+    """Metadata stored next to results so baselines are compared like for like"""
+    return {
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+def compare(results, baseline, tolerance=0.10):
+    """
+    Compare p50 latency and throughput of each case against a baseline run
+    Returns rows with ratios (current / baseline); a case regresses when its
+    p50 grows, or its throughput drops, by more than tolerance.
+    """
+    rows = []
+    
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            rows.append({'case': name, 'status': 'new'})
+            continue
+        
+        p50_ratio = current['p50_ms'] / previous['p50_ms'] if previous['p50_ms'] else None
+        throughput_ratio = (current['throughput_per_s'] / previous['throughput_per_s']
+                            if previous.get('throughput_per_s') else None)
+        
+        regressed = ((p50_ratio is not None and p50_ratio > 1 + tolerance) or
+                     (throughput_ratio is not None and throughput_ratio < 1 - tolerance))
+        improved = p50_ratio is not None and p50_ratio < 1 - tolerance
+        
+        rows.append({
+            'case': name,
+            'status': 'regressed' if regressed else 'improved' if improved else 'unchanged',
+            'p50_ratio': round(p50_ratio, 3) if p50_ratio is not None else None,
+            'throughput_ratio': round(throughput_ratio, 3) if throughput_ratio is not None else None
+        })
+    
+    return rows
+
+def synthetic_locations(count, zone_count, rng):
+    """Random sample locations: (lats, lngs, uint8 zone codes)"""
+    lat_min, lat_max, lng_min, lng_max = REGION
+    return (
+        rng.uniform(lat_min, lat_max, count),
+        rng.uniform(lng_min, lng_max, count),
+        rng.integers(0, zone_count, count).astype(np.uint8)
+    )
+
+def synthetic_coordinates(count, rng):
+    """Random query coordinates inside REGION"""
+    lat_min, lat_max, lng_min, lng_max = REGION
+    return rng.uniform(lat_min, lat_max, count), rng.uniform(lng_min, lng_max, count)
+
+def synthetic_image(width, height, rng, format='JPEG'):
+    """Encoded bytes of a facade-like image: smooth gradient plus noise and window blocks"""
+    y, x = np.mgrid[0:height, 0:width]
+    base = (x / max(width - 1, 1) * 120 + y / max(height - 1, 1) * 60).astype(np.int16)
+    pixels = np.stack([base + 60, base + 40, base + 20], axis=-1)
+    pixels += rng.integers(-25, 26, pixels.shape, dtype=np.int16)
+    pixels[(y // 40) % 3 == 0] //= 2
+    
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format=format)
+    return buffer.getvalue()
@@ -0,0 +1,90 @@
+"""
+Nearest-zone lookup scaling: KD-tree index vs brute-force Haversine scan
+
+Run from the project root:
+    python -m benchmarks.spatial_index_scaling
+    python -m benchmarks.spatial_index_scaling --sizes 10 1000 100000 --queries 50000
+"""
+import argparse
+import json
+import time
+import numpy as np
+from spatial_index import SpatialIndex
+
+# Brute force is O(queries x points); skip it above this many points
+BRUTE_FORCE_LIMIT = 10000
+
+def random_points(count, rng):
+    """Uniform points over a bounding box roughly covering India"""
+    return rng.uniform(6.0, 36.0, count), rng.uniform(68.0, 97.0, count)
+
+def brute_force_nearest(sample_lats, sample_lngs, lats, lngs):
+    """Reference linear scan, equivalent to the pre-index get_heat_data loop"""
+    sample_lat = np.radians(sample_lats)
+    sample_lng = np.radians(sample_lngs)
+    nearest = np.empty(len(lats), dtype=np.intp)
+    
+    for i, (lat, lng) in enumerate(zip(np.radians(lats), np.radians(lngs))):
+        a = (np.sin((sample_lat - lat) / 2) ** 2 +
+             np.cos(lat) * np.cos(sample_lat) * np.sin((sample_lng - lng) / 2) ** 2)
+        nearest[i] = np.argmin(a)
+    
+    return nearest
+
+def run(sizes, query_count, seed=0):
+    rng = np.random.default_rng(seed)
+    lats, lngs = random_points(query_count, rng)
+    rows = []
+    
+    for size in sizes:
+        sample_lats, sample_lngs = random_points(size, rng)
+        
+        start = time.perf_counter()
+        index = SpatialIndex(sample_lats, sample_lngs)
+        build_s = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        _, nearest = index.query(lats, lngs)
+        query_s = time.perf_counter() - start
+        
+        row = {
+            'points': size,
+            'build_ms': round(build_s * 1000, 3),
+            'query_ms': round(query_s * 1000, 3),
+            'us_per_query': round(query_s / query_count * 1e6, 3),
+            'brute_force_us_per_query': None
+        }
+        
+        if size <= BRUTE_FORCE_LIMIT:
+            probe = min(query_count, 2000)
+            start = time.perf_counter()
+            expected = brute_force_nearest(sample_lats, sample_lngs, lats[:probe], lngs[:probe])
+            row['brute_force_us_per_query'] = round((time.perf_counter() - start) / probe * 1e6, 3)
+            row['matches_brute_force'] = bool(np.array_equal(expected, nearest[:probe]))
+        
+        rows.append(row)
+    
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000, 100000, 1000000])
+    parser.add_argument('--queries', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='Print raw JSON rows')
+    args = parser.parse_args()
+    
+    rows = run(args.sizes, args.queries, args.seed)
+    
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    
+    print(f"{'points':>10} {'build ms':>10} {'query ms':>10} {'us/query':>10} {'brute us/query':>15}")
+    for row in rows:
+        brute = row['brute_force_us_per_query']
+        print(f"{row['points']:>10} {row['build_ms']:>10} {row['query_ms']:>10} "
+              f"{row['us_per_query']:>10} {'-' if brute is None else brute:>15}")
+
+if __name__ == '__main__':
+    main()
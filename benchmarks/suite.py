@@ -0,0 +1,223 @@
+"""
+End-to-end benchmark suite: heat lookup, grid generation, image analysis,
+recommendations and the Flask API routes
+
+Run from the project root:
+    python -m benchmarks.suite                           # table
+    python -m benchmarks.suite --output baseline.json    # save a baseline
+    python -m benchmarks.suite --baseline baseline.json  # compare, exit 1 on regression
+    python -m benchmarks.suite --only heat api --quick
+
+Every case reports throughput, p50/p99 latency and peak traced memory. Inputs
+are synthetic and seeded, so runs on the same machine are comparable.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import numpy as np
+from benchmarks.harness import (
+    measure, environment, compare, synthetic_locations, synthetic_coordinates, synthetic_image
+)
+
+GROUPS = ('heat', 'grid', 'image', 'recommendations', 'api')
+DATASET_SIZES = (1000, 100000)
+IMAGE_SIZES = ((640, 480), (1920, 1080), (4000, 3000))
+QUERY_BATCH = 10000
+SCORE_BATCH = 1000
+
+def build_processor(size, rng, work_dir):
+    """HeatDataProcessor over a synthetic columnar dataset of size points"""
+    from heat_data import HeatDataProcessor
+    from heat_dataset import HeatDataset
+    
+    with open('data/sample_heat_data.json', 'r') as f:
+        heat_zones = json.load(f)['heat_zones']
+    
+    path = os.path.join(work_dir, f'dataset_{size}')
+    lats, lngs, codes = synthetic_locations(size, len(heat_zones), rng)
+    HeatDataset(heat_zones, lats, lngs, codes, version=f'synthetic-{size}').save(path)
+    return HeatDataProcessor(path)
+
+def heat_cases(rng, work_dir, sizes):
+    for size in sizes:
+        processor = build_processor(size, rng, work_dir)
+        lats, lngs = synthetic_coordinates(QUERY_BATCH, rng)
+        processor.query_many(lats[:1], lngs[:1])  # Build the index outside the timings
+        
+        yield (f'heat.get_heat_data[{size}]',
+               lambda i, p=processor, la=lats, ln=lngs: p.get_heat_data(la[i % QUERY_BATCH], ln[i % QUERY_BATCH]),
+               2000, 1)
+        yield (f'heat.query_many[{size}x{QUERY_BATCH}]',
+               lambda i, p=processor, la=lats, ln=lngs: p.query_many(la, ln),
+               30, QUERY_BATCH)
+
+def grid_cases(rng, work_dir, sizes):
+    processor = build_processor(sizes[-1], rng, work_dir)
+    lats, lngs = synthetic_coordinates(256, rng)
+    processor.query_many(lats[:1], lngs[:1])
+    
+    for grid_size in (20, 100):
+        yield (f'grid.generate_heatmap_grid[{grid_size}]',
+               lambda i, g=grid_size: processor.generate_heatmap_grid(lats[i % 256], lngs[i % 256], grid_size=g),
+               200, grid_size * grid_size)
+
+def image_cases(rng, work_dir, sizes):
+    from building_analyzer import BuildingAnalyzer
+    analyzer = BuildingAnalyzer()
+    
+    for width, height in IMAGE_SIZES:
+        path = os.path.join(work_dir, f'building_{width}x{height}.jpg')
+        with open(path, 'wb') as f:
+            f.write(synthetic_image(width, height, rng))
+        
+        yield (f'image.analyze_image[{width}x{height}]',
+               lambda i, p=path: analyzer.analyze_image(p),
+               30, 1)
+
+def random_building_features(rng):
+    """Features as BuildingAnalyzer would infer them from a random image"""
+    from building_analyzer import BuildingAnalyzer
+    width, height = ((640, 480), (1280, 720), (1920, 1080))[rng.integers(3)]
+    return BuildingAnalyzer()._infer_building_features({
+        'width': width,
+        'height': height,
+        'dominant_colors': ('dark_colors', 'light_colors', 'mixed_colors')[rng.integers(3)],
+        'complexity': ('complex', 'moderate', 'simple')[rng.integers(3)]
+    })
+
+def recommendation_cases(rng, work_dir, sizes):
+    from recommendations import RecommendationEngine
+    engine = RecommendationEngine()
+    risk = ('LOW', 'MEDIUM', 'HIGH')
+    
+    inputs = [
+        ({'heat_index': round(float(h), 3), 'temperature': round(float(t), 1),
+          'risk_level': risk[int(h >= 0.5) + int(h >= 0.75)]},
+         random_building_features(rng) if rng.random() < 0.8 else None)
+        for h, t in zip(rng.uniform(0.1, 0.95, 256), rng.uniform(26, 42, 256))
+    ]
+    
+    yield ('recommendations.generate_recommendations',
+           lambda i: engine.generate_recommendations(*inputs[i % 256]),
+           5000, 1)
+    
+    heat_index = rng.uniform(0.1, 0.95, QUERY_BATCH)
+    yield (f'recommendations.score_many[{QUERY_BATCH}]',
+           lambda i: engine.score_many(heat_index, inputs[0][1]),
+           100, QUERY_BATCH)
+
+def api_cases(rng, work_dir, sizes):
+    # No on-disk tile cache, so every tile request measures a render
+    os.environ['TILE_CACHE_FOLDER'] = ''
+    os.environ['UPLOAD_FOLDER'] = work_dir
+    import server
+    client = server.app.test_client()
+    
+    lats, lngs = synthetic_coordinates(256, rng)
+    image = synthetic_image(1920, 1080, rng)
+    
+    def analyze_location(i):
+        response = client.post('/api/analyze-location',
+                               json={'latitude': float(lats[i % 256]), 'longitude': float(lngs[i % 256])})
+        assert response.status_code == 200, response.data
+    
+    def upload(i, unique=True):
+        # Trailing bytes after the JPEG end marker change the content hash but not the pixels
+        data = image + i.to_bytes(8, 'little') if unique else image
+        response = client.post('/api/upload', data={'building_image': (io.BytesIO(data), 'building.jpg')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200, response.data
+    
+    site_lats, site_lngs = synthetic_coordinates(SCORE_BATCH, rng)
+    sites = {'latitudes': site_lats.tolist(), 'longitudes': site_lngs.tolist()}
+    
+    def score_sites(i):
+        response = client.post('/api/score-sites', json=sites)
+        assert response.status_code == 200 and response.data.count(b'\n') == SCORE_BATCH + 1
+    
+    def heat_tile(i):
+        # Distinct z=10 tiles over the region, more than the in-memory tile cache holds
+        response = client.get(f'/api/heat-tiles/10/{704 + i % 32}/{430 + i // 32 % 32}.png')
+        assert response.status_code == 200, response.data
+    
+    yield 'api.analyze_location', analyze_location, 200, 1
+    yield 'api.upload[1920x1080]', upload, 30, 1
+    yield 'api.upload_cached[1920x1080]', lambda i: upload(i, unique=False), 100, 1
+    yield f'api.score_sites[{SCORE_BATCH}]', score_sites, 50, SCORE_BATCH
+    yield 'api.heat_tile[z10]', heat_tile, 100, 1
+
+CASE_FACTORIES = {
+    'heat': heat_cases,
+    'grid': grid_cases,
+    'image': image_cases,
+    'recommendations': recommendation_cases,
+    'api': api_cases
+}
+
+def run(groups=GROUPS, sizes=DATASET_SIZES, quick=False, seed=0, verbose=False):
+    rng = np.random.default_rng(seed)
+    results = {}
+    
+    with tempfile.TemporaryDirectory(prefix='heatwatch-bench-') as work_dir:
+        for group in groups:
+            for name, fn, iterations, items in CASE_FACTORIES[group](rng, work_dir, sizes):
+                if quick:
+                    iterations = max(5, iterations // 10)
+                if verbose:
+                    print(f'  {name} ...', file=sys.stderr)
+                results[name] = measure(fn, iterations, warmup=min(10, iterations), items=items)
+    
+    return results
+
+def print_table(results):
+    print(f"{'case':<48} {'throughput/s':>14} {'p50 ms':>10} {'p99 ms':>10} {'peak KB':>10}")
+    for name, row in results.items():
+        print(f"{name:<48} {row['throughput_per_s']:>14} {row['p50_ms']:>10} {row['p99_ms']:>10} {row['peak_mem_kb']:>10}")
+
+def print_comparison(rows):
+    print(f"\n{'case':<48} {'status':>10} {'p50 x':>8} {'thru x':>8}")
+    for row in rows:
+        print(f"{row['case']:<48} {row['status']:>10} {row.get('p50_ratio') or '-':>8} "
+              f"{row.get('throughput_ratio') or '-':>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=list(GROUPS), help='Case groups to run')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DATASET_SIZES),
+                        help='Synthetic sample-location counts for the heat cases')
+    parser.add_argument('--quick', action='store_true', help='A tenth of the iterations, for smoke runs')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', '-o', help='Write results JSON here (use as a later --baseline)')
+    parser.add_argument('--baseline', help='Results JSON from an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed relative slowdown')
+    parser.add_argument('--json', action='store_true', help='Print the results JSON instead of a table')
+    args = parser.parse_args()
+    
+    results = run(args.only, args.sizes, args.quick, args.seed, verbose=not args.json)
+    report = {'environment': environment(), 'seed': args.seed, 'results': results}
+    
+    comparison = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            comparison = compare(results, json.load(f)['results'], args.tolerance)
+        report['comparison'] = comparison
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(results)
+        if comparison is not None:
+            print_comparison(comparison)
+    
+    if comparison and any(row['status'] == 'regressed' for row in comparison):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
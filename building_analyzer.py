@@ -1,33 +1,85 @@
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from PIL import Image
 import numpy as np
+from metrics import timed
+from image_features import FeatureAccumulator
+
+# Decoded pixel budget for analysis; larger images are reduced before statistics
+MAX_ANALYSIS_PIXELS = 2000000
+
+# Largest decode allowed, checked on the header size before any pixels are read.
+# Only JPEG can decode straight to a reduced scale; every other format is decoded
+# in full before reduce(), so this is what bounds peak memory per image.
+MAX_DECODE_PIXELS = 32000000
+
+# Rows converted to NumPy at a time while accumulating statistics
+STRIP_ROWS = 256
+
+# Bumped when analyze_image output changes, so cached analyses are not reused
+FEATURES_VERSION = 2
+
+# Luminance histogram bins reported in image_info (256 are accumulated)
+HISTOGRAM_BINS = 16
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
+
+def _analyze_chunk(paths, max_pixels, strip_rows, max_decode_pixels):
+    """Worker entry point: analyze a chunk of images in a pool process"""
+    analyzer = BuildingAnalyzer(max_pixels, strip_rows, max_decode_pixels)
+    return [(path, analyzer.analyze_image(path)) for path in paths]
 
 class BuildingAnalyzer:
     """Analyzes building images to extract characteristics"""
     
+    def __init__(self, max_pixels=MAX_ANALYSIS_PIXELS, strip_rows=STRIP_ROWS, max_decode_pixels=MAX_DECODE_PIXELS):
+        """
+        max_pixels: images larger than this are analysed at reduced resolution;
+        JPEG decodes at a reduced scale (draft mode), other formats are decoded
+        in full and then shrunk with Image.reduce. None analyses full resolution.
+        strip_rows: rows per strip when accumulating pixel statistics
+        max_decode_pixels: images that would decode to more pixels than this
+        (after JPEG draft scaling) are rejected unread; None disables the check
+        """
+        self.max_pixels = max_pixels
+        self.strip_rows = strip_rows
+        self.max_decode_pixels = max_decode_pixels
+    
+    @timed('image.analyze')
     def analyze_image(self, image_path):
         """
         Analyze building image to extract features
         For demo purposes, uses simple image analysis
+        image_path: a path or a binary file object, e.g. an in-memory upload
         """
         try:
-            img = Image.open(image_path)
-            
-            # Convert to RGB if needed
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # Get image statistics
-            img_array = np.array(img)
+            with Image.open(image_path) as img:
+                # Dimensions come from the header, before any reduced decode
+                width, height = img.size
+                
+                img = self._load_reduced(img)
+                stats = self._pixel_statistics(img)
             
             # Analyze image characteristics
             characteristics = {
-                'image_size': img.size,
-                'width': img.size[0],
-                'height': img.size[1],
-                'aspect_ratio': round(img.size[0] / img.size[1], 2),
-                'average_brightness': self._calculate_brightness(img_array),
-                'complexity': self._estimate_complexity(img_array),
-                'dominant_colors': self._get_dominant_colors(img_array)
+                'image_size': (width, height),
+                'width': width,
+                'height': height,
+                'aspect_ratio': round(width / height, 2),
+                'average_brightness': round(stats['mean'] / 255, 2),
+                'complexity': self._classify_complexity(stats['std']),
+                'dominant_colors': self._classify_colors(*stats['channel_means']),
+                'luminance_histogram': self._histogram_shares(stats['luminance_histogram']),
+                'color_palette': [
+                    {'rgb': list(rgb), 'hex': '#{:02x}{:02x}{:02x}'.format(*rgb), 'share': round(share, 3)}
+                    for rgb, share in stats['palette']
+                ],
+                'edge_density': round(stats['edge_density'], 3),
+                'roof_albedo': round(stats['albedo'], 3)
             }
             
             # Infer building characteristics
@@ -38,24 +90,120 @@ class BuildingAnalyzer:
                 'image_info': characteristics,
                 'building_features': building_features
             }
-            
+        
         except Exception as e:
             return {
                 'success': False,
                 'error': str(e)
             }
     
-    def _calculate_brightness(self, img_array):
-        """Calculate average brightness of image"""
-        grayscale = np.mean(img_array, axis=2)
-        avg_brightness = np.mean(grayscale)
-        return round(avg_brightness / 255, 2)
+    def analyze_many(self, paths, workers=None, chunksize=16, executor=None):
+        """
+        Analyze many images across a process pool
+        Yields {'path': ..., **analyze_image result} in completion order, so
+        results stream back while later chunks are still running. Paths are
+        sent to workers in chunks of chunksize, with at most two chunks per
+        worker in flight. workers=1 runs in-process; pass executor to reuse a
+        long-lived ProcessPoolExecutor instead of starting one per call.
+        """
+        paths = list(paths)
+        chunks = [paths[i:i + chunksize] for i in range(0, len(paths), chunksize)]
+        
+        if workers == 1 and executor is None:
+            for chunk in chunks:
+                for path, result in _analyze_chunk(chunk, self.max_pixels, self.strip_rows, self.max_decode_pixels):
+                    yield {'path': path, **result}
+            return
+        
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor(max_workers=workers)
+        
+        max_in_flight = 2 * (workers or os.cpu_count() or 1)
+        pending = set()
+        
+        try:
+            for chunk in chunks:
+                pending.add(executor.submit(
+                    _analyze_chunk, chunk, self.max_pixels, self.strip_rows, self.max_decode_pixels
+                ))
+                
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from self._chunk_results(done)
+            
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from self._chunk_results(done)
+        finally:
+            for future in pending:
+                future.cancel()
+            if own_executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _chunk_results(self, futures):
+        for future in futures:
+            for path, result in future.result():
+                yield {'path': path, **result}
     
-    def _estimate_complexity(self, img_array):
-        """Estimate image complexity (proxy for building detail)"""
-        # Calculate standard deviation as a measure of complexity
-        std_dev = np.std(img_array)
+    @timed('image.decode')
+    def _load_reduced(self, img):
+        """
+        Decode img as RGB, at reduced resolution if it exceeds the pixel budget
+        Only JPEG is decoded at a reduced scale; other formats are decoded in
+        full first, so images whose decode would exceed max_decode_pixels are
+        rejected with ValueError before any pixel data is read.
+        """
+        width, height = img.size
+        
+        if self.max_pixels and width * height > self.max_pixels:
+            scale = math.sqrt(self.max_pixels / (width * height))
+            target = (max(1, int(width * scale)), max(1, int(height * scale)))
+            
+            # JPEG can decode straight to a 1/2, 1/4 or 1/8 scale; no-op for other formats
+            img.draft('RGB', target)
+        
+        decoded = img.size[0] * img.size[1]
+        if self.max_decode_pixels and decoded > self.max_decode_pixels:
+            raise ValueError(
+                f'Image too large to analyze: {width}x{height} would decode {decoded} pixels, '
+                f'limit is {self.max_decode_pixels}'
+            )
         
+        if self.max_pixels and decoded > self.max_pixels:
+            factor = math.ceil(math.sqrt(decoded / self.max_pixels))
+            if img.mode not in ('RGB', 'RGBA', 'L'):
+                img = img.convert('RGB')
+            img = img.reduce(factor)
+        
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        
+        return img
+    
+    @timed('image.pixel_statistics')
+    def _pixel_statistics(self, img):
+        """
+        Single pass over row strips, see image_features.FeatureAccumulator
+        mean, std and channel_means match np.mean/np.std over the full array
+        without materialising it or any full-size float temporaries; the same
+        pass yields the luminance histogram, edge density, albedo and palette.
+        """
+        width, height = img.size
+        features = FeatureAccumulator(width, height)
+        
+        for top in range(0, height, self.strip_rows):
+            features.update(np.asarray(img.crop((0, top, width, min(top + self.strip_rows, height)))))
+        
+        return features.result()
+    
+    def _histogram_shares(self, histogram):
+        """Fold a 256-bin luma histogram into HISTOGRAM_BINS fractions of the pixels"""
+        folded = histogram.reshape(HISTOGRAM_BINS, -1).sum(axis=1)
+        return [round(share, 4) for share in (folded / folded.sum()).tolist()]
+    
+    def _classify_complexity(self, std_dev):
+        """Map pixel standard deviation to a complexity category"""
         if std_dev > 60:
             return 'complex'
         elif std_dev > 30:
@@ -63,12 +211,8 @@ class BuildingAnalyzer:
         else:
             return 'simple'
     
-    def _get_dominant_colors(self, img_array):
-        """Get dominant color categories"""
-        avg_r = np.mean(img_array[:, :, 0])
-        avg_g = np.mean(img_array[:, :, 1])
-        avg_b = np.mean(img_array[:, :, 2])
-        
+    def _classify_colors(self, avg_r, avg_g, avg_b):
+        """Classify mean RGB values into a colour category"""
         # Classify based on RGB values
         if avg_r > 180 and avg_g > 180 and avg_b > 180:
             return 'light_colors'
@@ -116,3 +260,40 @@ class BuildingAnalyzer:
             features['design_factor'] = 1.2
         
         return features
+
+def _expand_paths(inputs):
+    """Expand directories into the image files they contain, recursively"""
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in sorted(files):
+                    if '.' in name and name.rsplit('.', 1)[1].lower() in IMAGE_EXTENSIONS:
+                        yield os.path.join(root, name)
+        else:
+            yield item
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch-analyze building images, one NDJSON result per line')
+    parser.add_argument('paths', nargs='+', help='Image files or directories')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--chunksize', type=int, default=16, help='Images per worker task')
+    parser.add_argument('--max-pixels', type=int, default=MAX_ANALYSIS_PIXELS,
+                        help='Decode budget per image, 0 for full resolution')
+    parser.add_argument('--max-decode-pixels', type=int, default=MAX_DECODE_PIXELS,
+                        help='Reject images that would decode to more pixels than this, 0 for no limit')
+    parser.add_argument('--output', '-o', help='Write NDJSON here instead of stdout')
+    args = parser.parse_args()
+    
+    analyzer = BuildingAnalyzer(max_pixels=args.max_pixels or None, max_decode_pixels=args.max_decode_pixels or None)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    
+    try:
+        for result in analyzer.analyze_many(_expand_paths(args.paths), args.workers, args.chunksize):
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from heat_dataset import HeatDataset, METADATA_FILE
+
+def file_signature(data_file):
+    """(mtime_ns, size) of the file a dataset is loaded from, None if missing"""
+    # Columnar directories write dataset.json last, so it marks a finished conversion
+    path = os.path.join(data_file, METADATA_FILE) if HeatDataset.is_columnar(data_file) else data_file
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class DatasetWatcher:
+    """
+    Background hot reload for a HeatDataProcessor
+    A daemon thread polls the data file's mtime and size every interval
+    seconds (None: only explicit requests) and calls processor.reload() once
+    the file has stopped changing for one poll, so half-written files are not
+    loaded. request_reload() asks for a reload from any thread without waiting.
+    Reloads run one at a time on the watcher thread; a failed reload keeps the
+    current snapshot and is reported in status().
+    """
+    
+    def __init__(self, processor, interval=5.0):
+        self.processor = processor
+        self.interval = interval
+        self.reloads = 0
+        self.last_reload_at = None
+        self.last_error = None
+        self._signature = file_signature(processor.data_file)
+        self._requested = threading.Event()
+        self._stopped = threading.Event()
+        self._pending = None
+        self._reloading = False
+        self._thread = None
+    
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='dataset-watcher', daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stopped.set()
+        self._requested.set()
+    
+    def request_reload(self, data_file=None):
+        """Queue a reload (optionally switching files); returns immediately"""
+        self._pending = data_file
+        self._requested.set()
+    
+    def _run(self):
+        changed = None
+        
+        while not self._stopped.is_set():
+            requested = self._requested.wait(self.interval)
+            if self._stopped.is_set():
+                return
+            
+            if requested:
+                self._requested.clear()
+                data_file, self._pending = self._pending, None
+                self._reload(data_file)
+                changed = None
+                continue
+            
+            signature = file_signature(self.processor.data_file)
+            if signature is None or signature == self._signature:
+                changed = None
+            elif signature == changed:
+                # Unchanged since the last poll: the writer has finished
+                self._reload(None)
+                changed = None
+            else:
+                changed = signature
+    
+    def _reload(self, data_file):
+        self._reloading = True
+        try:
+            signature = file_signature(data_file or self.processor.data_file)
+            self.processor.reload(data_file)
+            self._signature = signature
+            self.reloads += 1
+            self.last_reload_at = time.time()
+            self.last_error = None
+        except Exception as e:
+            # Keep serving the old snapshot; don't retry until the file changes again
+            self._signature = file_signature(data_file or self.processor.data_file)
+            self.last_error = f'{type(e).__name__}: {e}'
+        finally:
+            self._reloading = False
+    
+    def status(self):
+        snapshot = self.processor.snapshot
+        return {
+            'data_file': snapshot.data_file,
+            'data_version': snapshot.version,
+            'generation': snapshot.generation,
+            'reloading': self._reloading,
+            'reloads': self.reloads,
+            'last_reload_at': self.last_reload_at,
+            'last_error': self.last_error,
+            'watch_interval': self.interval
+        }
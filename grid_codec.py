@@ -0,0 +1,57 @@
+import base64
+import numpy as np
+
+GRID_FORMAT = 'grid-u8'
+GRID_MEDIA_TYPE = 'application/vnd.heatwatch.grid+json'
+INTENSITY_SCALE = (0.0, 1.0)  # Heat index range mapped onto uint8 0..255
+
+def grid_points(grid):
+    """Legacy list of {'lat', 'lng', 'intensity'} dicts, rows following lats"""
+    intensity = np.asarray(grid['intensity'])
+    lats = np.asarray(grid['lats'])[:intensity.shape[0]]
+    lngs = np.asarray(grid['lngs'])[:intensity.shape[1]]
+    
+    return [
+        {'lat': lat, 'lng': lng, 'intensity': value}
+        for lat, row in zip(lats.tolist(), intensity.tolist())
+        for lng, value in zip(lngs.tolist(), row)
+    ]
+
+def encode_compact(grid):
+    """
+    Grid header plus base64 uint8 intensities
+    Cell (r, c) sits at origin + (r * step[0], c * step[1]); intensities are
+    row-major and quantized to 1/255 of INTENSITY_SCALE, well below what the
+    colour ramp can show. 400 cells take ~0.6 KB instead of ~25 KB of points.
+    """
+    intensity = np.asarray(grid['intensity'], dtype=np.float64)
+    rows, cols = intensity.shape
+    lats = np.asarray(grid['lats'], dtype=np.float64)
+    lngs = np.asarray(grid['lngs'], dtype=np.float64)
+    low, high = INTENSITY_SCALE
+    
+    levels = np.clip(np.rint((intensity - low) / (high - low) * 255), 0, 255).astype(np.uint8)
+    
+    return {
+        'format': GRID_FORMAT,
+        'origin': [float(lats[0]), float(lngs[0])],
+        'step': [float(lats[1] - lats[0]) if rows > 1 else 0.0, float(lngs[1] - lngs[0]) if cols > 1 else 0.0],
+        'dims': [rows, cols],
+        'scale': [low, high],
+        'intensity': base64.b64encode(levels.tobytes()).decode('ascii')
+    }
+
+def decode_compact(payload):
+    """Inverse of encode_compact: {'lats', 'lngs', 'intensity'} arrays"""
+    rows, cols = payload['dims']
+    low, high = payload['scale']
+    levels = np.frombuffer(base64.b64decode(payload['intensity']), dtype=np.uint8).reshape(rows, cols)
+    
+    return {
+        'lats': payload['origin'][0] + np.arange(rows) * payload['step'][0],
+        'lngs': payload['origin'][1] + np.arange(cols) * payload['step'][1],
+        'intensity': low + levels / 255.0 * (high - low)
+    }
+
+def is_compact(heatmap_data):
+    return isinstance(heatmap_data, dict) and heatmap_data.get('format') == GRID_FORMAT
@@ -1,67 +1,375 @@
-import json
-import math
+import sys
+import threading
 import numpy as np
+from cache import LRUCache
+from heat_dataset import HeatDataset
+from heat_timeseries import TimeSeriesStore, parse_time, format_time, summarize
+from spatial_index import SpatialIndex
+from interpolation import get_interpolator, weighted_average, coordinate_noise
+from metrics import stage, timed
+
+VARIATION_MODES = ('deterministic', 'random', 'none')
+
+# Risk levels indexed by risk code, and the minimum heat index for codes 1 and 2
+RISK_LEVELS = ('LOW', 'MEDIUM', 'HIGH')
+RISK_THRESHOLDS = (0.50, 0.75)
+
+# Heat index change per degree C when zones are too few to fit one
+DEFAULT_TEMP_SLOPE = 0.065
+
+class HeatSnapshot:
+    """
+    One loaded dataset with its zone tables and spatial index
+    Never mutated after construction (the index is filled in once, lazily), so
+    a reload builds a new snapshot and swaps the reference in one assignment.
+    """
+    
+    def __init__(self, data_file, generation=0, timeseries=None):
+        # data_file: JSON dataset or a columnar directory written by heat_dataset.py
+        # timeseries: optional heat_timeseries.py store with one column per sample
+        self.dataset = HeatDataset.open(data_file)
+        self.data_file = data_file
+        self.timeseries_path = timeseries
+        self.generation = generation
+        self.version = self.dataset.version
+        self.heat_zones = self.dataset.heat_zones
+        self.zone_names = self.dataset.zone_names
+        
+        self.zone_heat_index = np.array(
+            [self.heat_zones[name]['heat_index'] for name in self.zone_names], dtype=np.float64
+        )
+        self.zone_base_temp = np.array(
+            [self.heat_zones[name]['base_temp'] for name in self.zone_names], dtype=np.float64
+        )
+        self.default_zone_code = self.zone_names.index('suburban') if 'suburban' in self.heat_zones else 0
+        
+        # How far a reading above or below the zone's base temperature moves its heat index
+        if len(set(self.zone_base_temp.tolist())) > 1:
+            self.temp_slope = float(np.polyfit(self.zone_base_temp, self.zone_heat_index, 1)[0])
+        else:
+            self.temp_slope = DEFAULT_TEMP_SLOPE
+        
+        self.timeseries = None
+        if timeseries and TimeSeriesStore.exists(timeseries):
+            self.timeseries = TimeSeriesStore(timeseries)
+            if self.timeseries.locations != len(self.dataset):
+                raise ValueError(
+                    f'Time series {timeseries} has {self.timeseries.locations} locations, '
+                    f'dataset {data_file} has {len(self.dataset)}'
+                )
+        
+        self._index = None
+        self._index_lock = threading.Lock()
+    
+    @property
+    def spatial_index(self):
+        """KD-tree over the samples, built on first use so startup stays cheap"""
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    with stage('heat.index_build'):
+                        self._index = SpatialIndex(self.dataset.lats, self.dataset.lngs)
+        return self._index
 
 class HeatDataProcessor:
     """Processes and generates Urban Heat Island data for given coordinates"""
     
-    def __init__(self, data_file='data/sample_heat_data.json'):
-        with open(data_file, 'r') as f:
-            self.data = json.load(f)
-        self.heat_zones = self.data['heat_zones']
-        self.sample_locations = self.data['sample_locations']
+    def __init__(self, data_file='data/sample_heat_data.json', interpolation='idw',
+                 variation='deterministic', variation_seed=0, cache_size=4096, cache_precision=4,
+                 timeseries=None, **interpolation_options):
+        """
+        interpolation: 'nearest', 'idw', 'gaussian' or an interpolator instance
+        variation: temperature jitter mode - 'deterministic' (hashed from the
+        coordinates, repeatable), 'random' (legacy per-call noise) or 'none'
+        cache_size: get_heat_data results kept in an LRU, 0 to disable
+        cache_precision: decimal places coordinates are snapped to for the cache
+        (4 is ~11 m); every point in a cell shares the value at its snapped
+        centre. Not used in 'random' mode, whose results must differ per call.
+        timeseries: directory of a heat_timeseries.py store for the dataset's
+        samples; enables lookups at a point in time and exposure queries
+        """
+        if variation not in VARIATION_MODES:
+            raise ValueError(f"Unknown variation mode '{variation}'. Choose from: {', '.join(VARIATION_MODES)}")
+        
+        self.interpolator = get_interpolator(interpolation, **interpolation_options)
+        self.variation = variation
+        self.variation_seed = variation_seed
+        self.cache_precision = cache_precision
+        self._cache = LRUCache(cache_size) if cache_size and variation != 'random' else None
+        self._cache_entry_bytes = 0
+        self._reload_lock = threading.Lock()
+        self._snapshot = HeatSnapshot(data_file, timeseries=timeseries)
+    
+    @property
+    def snapshot(self):
+        """The current dataset snapshot; read it once per operation and keep using it"""
+        return self._snapshot
+    
+    @property
+    def dataset(self):
+        return self._snapshot.dataset
+    
+    @property
+    def data_file(self):
+        return self._snapshot.data_file
+    
+    @property
+    def data_version(self):
+        """Content fingerprint, lets downstream caches tell datasets apart"""
+        return self._snapshot.version
     
-    def get_heat_data(self, lat, lng):
+    @property
+    def heat_zones(self):
+        return self._snapshot.heat_zones
+    
+    @property
+    def zone_names(self):
+        return self._snapshot.zone_names
+    
+    @property
+    def spatial_index(self):
+        return self._snapshot.spatial_index
+    
+    @property
+    def timeseries(self):
+        return self._snapshot.timeseries
+    
+    @property
+    def sample_locations(self):
+        """Legacy list-of-dicts view of the samples, materialized on demand"""
+        return self._snapshot.dataset.sample_locations()
+    
+    def reload(self, data_file=None):
+        """
+        Load the data file (or another one) into a new snapshot and swap it in
+        The new spatial index is built before the swap, so lookups never wait on
+        it; lookups already running finish on the snapshot they started with.
+        Returns the new snapshot. Raises, keeping the old snapshot, on bad data.
+        """
+        with self._reload_lock:
+            current = self._snapshot
+            snapshot = HeatSnapshot(data_file or current.data_file, current.generation + 1, current.timeseries_path)
+            snapshot.spatial_index
+            self._snapshot = snapshot
+            
+            # Entries keyed on older generations can never hit again; clear them now
+            if self._cache is not None:
+                self._cache.clear()
+        
+        return snapshot
+    
+    @timed('heat.get_heat_data')
+    def get_heat_data(self, lat, lng, at=None):
         """
         Calculate heat data for given coordinates
-        Uses distance-based interpolation from sample locations
+        Uses distance-based interpolation from sample locations; repeat lookups
+        within the same cache cell are served from the LRU.
+        at: a time (epoch seconds or ISO 8601) to use that hour's time series
+        readings instead of the zone baseline; the result gains a 'time' key.
         """
-        # Find nearest sample location
-        min_distance = float('inf')
-        nearest_zone = 'suburban'
-        
-        for location in self.sample_locations:
-            distance = self._calculate_distance(
-                lat, lng, 
-                location['lat'], location['lng']
-            )
-            if distance < min_distance:
-                min_distance = distance
-                nearest_zone = location['zone']
+        snapshot = self._snapshot
+        hour = self._hour(snapshot, at)
+        
+        if self._cache is None:
+            return self._compute_heat_data(snapshot, lat, lng, hour)
+        
+        # The store is append-only, so an hour's result only changes when it is first stored
+        stored = hour is not None and self._stored(snapshot, hour)
+        key = (snapshot.generation, round(lat, self.cache_precision), round(lng, self.cache_precision), hour, stored)
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = self._compute_heat_data(snapshot, key[1], key[2], hour)
+            if not self._cache_entry_bytes:
+                self._cache_entry_bytes = _entry_size(key, cached)
+            self._cache.put(key, cached)
+        
+        # Cached dicts are shared; callers get their own copy with the exact coordinates
+        result = dict(cached)
+        result['latitude'] = lat
+        result['longitude'] = lng
+        return result
+    
+    def _hour(self, snapshot, at):
+        """at as the epoch second its hour starts, None for the zone baseline"""
+        if at is None:
+            return None
+        if snapshot.timeseries is None:
+            raise ValueError('No heat time series loaded')
+        return parse_time(at) // snapshot.timeseries.step * snapshot.timeseries.step
+    
+    def _stored(self, snapshot, hour):
+        """Whether the time series already holds the hour, picking up rows appended since the last call"""
+        timeseries = snapshot.timeseries
+        timeseries.refresh()
+        return timeseries.start <= hour < timeseries.end
+    
+    def _compute_heat_data(self, snapshot, lat, lng, hour=None):
+        lookup = self.query_many(lat, lng, snapshot=snapshot, at=hour)
         
-        # Get zone data
-        zone_data = self.heat_zones[nearest_zone]
+        # Zone labels come from the nearest sample location
+        nearest_zone = snapshot.zone_names[int(lookup['zone_code'][0])]
+        zone_data = snapshot.heat_zones[nearest_zone]
         
-        # Add some randomness for variation
-        temp_variation = np.random.uniform(-2, 2)
+        heat_index = round(float(lookup['heat_index'][0]), 3)
+        if hour is not None and lookup['observed'][0]:
+            temp_variation = 0.0  # Measured temperatures need no synthetic jitter
+        else:
+            temp_variation = float(self._temperature_variation(lat, lng)[0])
         
         result = {
             'latitude': lat,
             'longitude': lng,
-            'temperature': round(zone_data['base_temp'] + temp_variation, 1),
-            'heat_index': zone_data['heat_index'],
+            'temperature': round(float(lookup['base_temp'][0]) + temp_variation, 1),
+            'heat_index': heat_index,
             'zone_type': nearest_zone,
             'zone_description': zone_data['description'],
-            'risk_level': self._calculate_risk_level(zone_data['heat_index'])
+            'risk_level': self._calculate_risk_level(heat_index)
         }
+        if hour is not None:
+            result['time'] = format_time(hour)
         
         return result
     
-    def _calculate_distance(self, lat1, lng1, lat2, lng2):
-        """Calculate distance between two coordinates using Haversine formula"""
-        R = 6371  # Earth's radius in km
+    def cache_stats(self):
+        """Hit ratio and approximate memory footprint of the lookup cache"""
+        if self._cache is None:
+            return {'enabled': False}
+        
+        stats = self._cache.stats()
+        stats.update({
+            'enabled': True,
+            'precision': self.cache_precision,
+            'approx_bytes': stats['size'] * self._cache_entry_bytes
+        })
+        return stats
+    
+    def _temperature_variation(self, lats, lngs):
+        """Temperature jitter per coordinate according to the configured variation mode"""
+        count = np.asarray(lats).size
+        
+        if self.variation == 'deterministic':
+            return coordinate_noise(lats, lngs, amplitude=2.0, seed=self.variation_seed)
+        elif self.variation == 'random':
+            return np.random.uniform(-2, 2, count)
+        else:
+            return np.zeros(count)
+    
+    @timed('heat.query_many')
+    def query_many(self, lats, lngs, snapshot=None, at=None):
+        """
+        Batch heat lookup for many coordinates
+        Accepts scalars or arrays of any shape (flattened) and returns a dict of
+        arrays. 'sample_index' (-1 when no samples are loaded), 'distance_km' and
+        'zone_code' (index into self.zone_names) describe the nearest sample;
+        'heat_index' and 'base_temp' are interpolated over the interpolator's
+        k nearest samples. snapshot pins the dataset (default: the current one).
+        With at, samples that have a time series reading for that hour use it
+        as their temperature and shift their heat index by the zone fit; the
+        rest keep the zone baseline. 'observed' then flags coordinates whose
+        neighbours had at least one reading. Only that hour's row is read.
+        """
+        snapshot = snapshot or self._snapshot
+        lats = np.asarray(lats, dtype=np.float64).ravel()
+        lngs = np.asarray(lngs, dtype=np.float64).ravel()
+        
+        if len(snapshot.dataset) == 0:
+            zone_code = np.full(lats.shape, snapshot.default_zone_code, dtype=np.intp)
+            return {
+                'sample_index': np.full(lats.shape, -1, dtype=np.intp),
+                'distance_km': np.full(lats.shape, np.inf),
+                'zone_code': zone_code,
+                'heat_index': snapshot.zone_heat_index[zone_code],
+                'base_temp': snapshot.zone_base_temp[zone_code]
+            }
         
-        dlat = math.radians(lat2 - lat1)
-        dlng = math.radians(lng2 - lng1)
+        distance_km, neighbours = snapshot.spatial_index.query(lats, lngs, k=self.interpolator.k)
+        if distance_km.ndim == 1:
+            distance_km, neighbours = distance_km[:, None], neighbours[:, None]
         
-        a = (math.sin(dlat / 2) ** 2 + 
-             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * 
-             math.sin(dlng / 2) ** 2)
+        weights = self.interpolator.weights(distance_km)
+        zone_codes = snapshot.dataset.zone_codes[neighbours]
+        heat_index = snapshot.zone_heat_index[zone_codes]
+        base_temp = snapshot.zone_base_temp[zone_codes]
         
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        distance = R * c
+        result = {
+            'sample_index': neighbours[:, 0],
+            'distance_km': distance_km[:, 0],
+            'zone_code': zone_codes[:, 0]
+        }
+        
+        if at is not None:
+            if snapshot.timeseries is None:
+                raise ValueError('No heat time series loaded')
+            
+            readings = snapshot.timeseries.at(at)
+            observed = np.zeros(neighbours.shape, dtype=bool)
+            if readings is not None:
+                readings = readings[neighbours].astype(np.float64)
+                observed = ~np.isnan(readings)
+                heat_index = np.where(
+                    observed, np.clip(heat_index + (readings - base_temp) * snapshot.temp_slope, 0, 1), heat_index
+                )
+                base_temp = np.where(observed, readings, base_temp)
+            result['observed'] = observed.any(axis=1)
         
-        return distance
+        result['heat_index'] = weighted_average(weights, heat_index)
+        result['base_temp'] = weighted_average(weights, base_temp)
+        return result
+    
+    def temperature_series(self, lat, lng, start, end):
+        """
+        Hourly temperatures at a coordinate over [start, end)
+        Interpolated from the time series of its k nearest samples with the
+        configured weights; samples missing an hour are left out of that hour's
+        average, and hours with no readings at all are NaN. Only the rows
+        between start and end are read. Returns (epoch times, temperatures).
+        """
+        snapshot = self._snapshot
+        if snapshot.timeseries is None:
+            raise ValueError('No heat time series loaded')
+        if len(snapshot.dataset) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        
+        distance_km, neighbours = snapshot.spatial_index.query(
+            np.array([lat], dtype=np.float64), np.array([lng], dtype=np.float64), k=self.interpolator.k
+        )
+        distance_km, neighbours = np.reshape(distance_km, (1, -1)), np.reshape(neighbours, -1)
+        weights = self.interpolator.weights(distance_km)
+        
+        with stage('heat.timeseries_read'):
+            times, values = snapshot.timeseries.values(neighbours, start, end)
+        
+        observed = ~np.isnan(values)
+        hour_weights = np.where(observed, weights, 0.0)
+        totals = hour_weights.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            temperatures = (np.where(observed, values, 0.0) * hour_weights).sum(axis=1) / totals
+        
+        return times, np.where(totals > 0, temperatures, np.nan)
+    
+    @timed('heat.heat_exposure')
+    def heat_exposure(self, lat, lng, start, end, threshold=35.0, series=False):
+        """
+        Max, mean and min temperature and degree-hours above threshold (deg C)
+        at a coordinate over [start, end), with the hour of the peak
+        series=True adds the hourly {'time', 'temperature'} values (None if missing).
+        """
+        times, temperatures = self.temperature_series(lat, lng, start, end)
+        result = {
+            'latitude': lat,
+            'longitude': lng,
+            'start': format_time(parse_time(start)),
+            'end': format_time(parse_time(end)),
+            'threshold': threshold
+        }
+        result.update(summarize(times, temperatures, threshold, self._snapshot.timeseries.step / 3600))
+        
+        if series:
+            result['series'] = [
+                {'time': format_time(moment), 'temperature': None if np.isnan(value) else round(value, 2)}
+                for moment, value in zip(times.tolist(), temperatures.tolist())
+            ]
+        return result
     
     def _calculate_risk_level(self, heat_index):
         """Determine risk level based on heat index"""
@@ -72,26 +380,45 @@ class HeatDataProcessor:
         else:
             return 'LOW'
     
-    def generate_heatmap_grid(self, center_lat, center_lng, grid_size=20, radius=0.05):
+    def risk_level_codes(self, heat_index):
+        """Vectorized _calculate_risk_level, returns indices into RISK_LEVELS"""
+        return np.searchsorted(RISK_THRESHOLDS, heat_index, side='right')
+    
+    @timed('heat.generate_heatmap_grid')
+    def generate_heatmap_grid(self, center_lat, center_lng, grid_size=20, radius=0.05, as_array=False, at=None):
         """
         Generate a grid of heat values around a center point for visualization
+        The whole lat/lng mesh is resolved in one batched, interpolated query.
+        With as_array=True returns {'lats', 'lngs', 'intensity'} where intensity
+        has shape (grid_size, grid_size), rows following lats and columns lngs.
+        at: use that hour's time series readings (see query_many).
         """
-        heatmap_data = []
-        
-        for i in range(grid_size):
-            for j in range(grid_size):
-                lat_offset = (i - grid_size/2) * (radius / grid_size) * 2
-                lng_offset = (j - grid_size/2) * (radius / grid_size) * 2
-                
-                lat = center_lat + lat_offset
-                lng = center_lng + lng_offset
-                
-                heat_data = self.get_heat_data(lat, lng)
-                
-                heatmap_data.append({
-                    'lat': lat,
-                    'lng': lng,
-                    'intensity': heat_data['heat_index']
-                })
-        
-        return heatmap_data
+        offsets = (np.arange(grid_size) - grid_size / 2) * (radius / grid_size) * 2
+        lats = center_lat + offsets
+        lngs = center_lng + offsets
+        
+        lat_grid, lng_grid = np.meshgrid(lats, lngs, indexing='ij')
+        intensity = self.query_many(lat_grid, lng_grid, at=at)['heat_index'].reshape(grid_size, grid_size)
+        
+        if as_array:
+            return {
+                'lats': lats,
+                'lngs': lngs,
+                'intensity': intensity
+            }
+        
+        return [
+            {'lat': lat, 'lng': lng, 'intensity': value}
+            for lat, lng, value in zip(
+                lat_grid.ravel().tolist(),
+                lng_grid.ravel().tolist(),
+                intensity.ravel().tolist()
+            )
+        ]
+
+def _entry_size(key, result):
+    """Rough bytes held by one cache entry: key tuple, result dict and their values"""
+    size = sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key) + sys.getsizeof(result)
+    # Zone strings are shared with heat_zones; count only the per-entry objects
+    size += sum(sys.getsizeof(value) for value in result.values() if not isinstance(value, str))
+    return size + 64  # OrderedDict link overhead
@@ -0,0 +1,201 @@
+"""
+Columnar heat zone datasets
+
+Convert a JSON dataset once:
+    python heat_dataset.py data/sample_heat_data.json --out data/heat_dataset
+
+The output directory holds a columns-* subdirectory with one .npy file per
+column (float64 lat/lng, uint8 zone code, optional UTF-8 names) plus a
+dataset.json with the interned zone table that names it. Columns are
+memory-mapped read-only on load, so opening a dataset costs a few
+milliseconds whatever its size and every worker process shares one
+page-cached copy.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+METADATA_FILE = 'dataset.json'
+DATASET_FORMAT = 2
+READABLE_FORMATS = (1, 2)  # Format 1 kept its columns directly in the output directory
+COLUMNS = ('lats', 'lngs', 'zone_codes')
+COLUMNS_PREFIX = 'columns-'
+OPEN_ATTEMPTS = 3  # A conversion may remove the columns named by the dataset.json just read
+MAX_ZONES = 256  # Zone codes are stored as uint8
+
+class HeatDataset:
+    """
+    Sample locations as parallel arrays plus an interned zone table
+    zone_codes index into zone_names (the keys of heat_zones, in file order).
+    version is a fingerprint of the source JSON and survives conversion, so
+    caches keyed on it stay valid across formats.
+    """
+    
+    def __init__(self, heat_zones, lats, lngs, zone_codes, names=None, version=None, path=None):
+        if len(heat_zones) > MAX_ZONES:
+            raise ValueError(f'At most {MAX_ZONES} heat zones are supported, got {len(heat_zones)}')
+        
+        self.heat_zones = heat_zones
+        self.zone_names = list(heat_zones)
+        self.lats = lats
+        self.lngs = lngs
+        self.zone_codes = zone_codes
+        self.names = names
+        self.version = version
+        self.path = path
+    
+    def __len__(self):
+        return len(self.lats)
+    
+    @classmethod
+    def is_columnar(cls, path):
+        return os.path.isfile(os.path.join(path, METADATA_FILE))
+    
+    @classmethod
+    def open(cls, path):
+        """Load a converted directory, or parse a JSON dataset file"""
+        return cls.load(path) if cls.is_columnar(path) else cls.from_json(path)
+    
+    @classmethod
+    def from_json(cls, path):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        
+        data = json.loads(raw)
+        heat_zones = data['heat_zones']
+        locations = data['sample_locations']
+        zone_codes = {name: code for code, name in enumerate(heat_zones)}
+        
+        return cls(
+            heat_zones,
+            np.array([location['lat'] for location in locations], dtype=np.float64),
+            np.array([location['lng'] for location in locations], dtype=np.float64),
+            np.array([zone_codes[location['zone']] for location in locations], dtype=np.uint8),
+            names=[location.get('name', '') for location in locations],
+            version=hashlib.sha1(raw).hexdigest()[:12],
+            path=path
+        )
+    
+    @classmethod
+    def load(cls, path):
+        """Memory-map a directory written by save()"""
+        for attempt in range(OPEN_ATTEMPTS):
+            with open(os.path.join(path, METADATA_FILE), 'r') as f:
+                metadata = json.load(f)
+            
+            if metadata.get('format') not in READABLE_FORMATS:
+                raise ValueError(f"Unsupported heat dataset format {metadata.get('format')} in {path}")
+            
+            columns_dir = os.path.join(path, metadata.get('columns_dir', ''))
+            names_file = os.path.join(columns_dir, 'names.npy')
+            has_names = metadata['names'] if 'names' in metadata else os.path.isfile(names_file)
+            try:
+                # asarray drops the memmap subclass so derived arrays are plain ndarrays
+                columns = {
+                    column: np.asarray(np.load(os.path.join(columns_dir, f'{column}.npy'), mmap_mode='r'))
+                    for column in COLUMNS
+                }
+                names = np.load(names_file, mmap_mode='r') if has_names else None
+                break
+            except FileNotFoundError:
+                if attempt == OPEN_ATTEMPTS - 1:
+                    raise
+        
+        # Catches a format 1 directory read halfway through being rewritten
+        lengths = [len(array) for array in (*columns.values(), names) if array is not None]
+        if any(length != metadata['count'] for length in lengths):
+            raise ValueError(f"Heat dataset columns in {path} do not match its count of {metadata['count']}")
+        
+        return cls(metadata['heat_zones'], names=names, version=metadata['version'], path=path, **columns)
+    
+    def save(self, out_dir):
+        """
+        Write the columnar form; dataset.json goes last so a partial write is never loaded
+        Columns go into a fresh columns-* directory and dataset.json is renamed
+        over the old one to switch every column at once, so a concurrent load()
+        sees either the old set or the new one. Earlier column directories are
+        deleted afterwards; servers that have them memory-mapped keep reading
+        the unlinked files.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        columns_dir = tempfile.mkdtemp(dir=out_dir, prefix=COLUMNS_PREFIX)
+        os.chmod(columns_dir, 0o755)  # mkdtemp creates 0700; server workers may run as another user
+        
+        has_names = self.names is not None and any(self.names)
+        try:
+            np.save(os.path.join(columns_dir, 'lats.npy'), np.asarray(self.lats, dtype=np.float64))
+            np.save(os.path.join(columns_dir, 'lngs.npy'), np.asarray(self.lngs, dtype=np.float64))
+            np.save(os.path.join(columns_dir, 'zone_codes.npy'), np.asarray(self.zone_codes, dtype=np.uint8))
+            if has_names:
+                names = np.char.encode(np.asarray(self.names, dtype=str), 'utf-8')
+                np.save(os.path.join(columns_dir, 'names.npy'), names)
+            
+            metadata = {
+                'format': DATASET_FORMAT,
+                'version': self.version,
+                'count': len(self),
+                'columns_dir': os.path.basename(columns_dir),
+                'names': has_names,
+                'heat_zones': self.heat_zones
+            }
+            _replace(out_dir, METADATA_FILE, lambda f: f.write(json.dumps(metadata, indent=2).encode('utf-8')))
+        except BaseException:
+            shutil.rmtree(columns_dir, ignore_errors=True)
+            raise
+        
+        _remove_stale_columns(out_dir, metadata['columns_dir'])
+        return metadata
+    
+    def name(self, index):
+        if self.names is None:
+            return ''
+        name = self.names[index]
+        return name.decode('utf-8') if isinstance(name, bytes) else name
+    
+    def sample_locations(self):
+        """Materialize the legacy list-of-dicts view (slow and large for big datasets)"""
+        return [
+            {'name': self.name(index), 'lat': lat, 'lng': lng, 'zone': self.zone_names[code]}
+            for index, (lat, lng, code) in enumerate(zip(
+                self.lats.tolist(), self.lngs.tolist(), self.zone_codes.tolist()
+            ))
+        ]
+
+def _replace(out_dir, filename, write):
+    """Write a file via a temporary sibling and os.replace, never truncating the existing one"""
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, prefix=f'.{filename}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates 0600
+        os.replace(tmp_path, os.path.join(out_dir, filename))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+def _remove_stale_columns(out_dir, keep):
+    """Delete earlier conversions, including columns from the format 1 flat layout"""
+    legacy = {f'{column}.npy' for column in (*COLUMNS, 'names')}
+    for name in os.listdir(out_dir):
+        path = os.path.join(out_dir, name)
+        if name.startswith(COLUMNS_PREFIX) and name != keep:
+            shutil.rmtree(path, ignore_errors=True)
+        elif name in legacy:
+            os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help='JSON dataset with heat_zones and sample_locations')
+    parser.add_argument('--out', default='data/heat_dataset')
+    args = parser.parse_args()
+    
+    metadata = HeatDataset.from_json(args.source).save(args.out)
+    
+    print(f"Wrote {metadata['count']} locations in {len(metadata['heat_zones'])} zones to {args.out}")
+
+if __name__ == '__main__':
+    main()
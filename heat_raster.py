@@ -0,0 +1,298 @@
+"""
+Precomputed heat intensity raster pyramid
+
+Build once per region, offline:
+    python heat_raster.py --bbox 6 36 68 97 --resolution 0.005 --levels 5 --out data/heat_raster
+
+Every level is a float32 .npy file that the server memory-maps read-only, so a
+grid request is an array slice and all workers share one page-cached copy.
+Row 0 is the southern edge of the bounding box and column 0 the western edge;
+cell centres sit half a step in from the edges.
+
+Each build writes its levels into a new levels-* subdirectory and then
+atomically replaces pyramid.json, which names that subdirectory and the
+dataset version it was computed from. Rebuilding into a directory a server is
+using never touches files it has mapped; the server reopens the new pyramid
+and ignores one built from a different dataset than it has loaded.
+"""
+import argparse
+import json
+import math
+import os
+import shutil
+import tempfile
+import numpy as np
+
+METADATA_FILE = 'pyramid.json'
+LEVELS_PREFIX = 'levels-'
+OPEN_ATTEMPTS = 3  # A rebuild may remove the levels named by the pyramid.json just read
+
+# Rows evaluated / downsampled per block while building, keeps build memory flat
+BUILD_BLOCK_ROWS = 256
+
+def _level_file(level):
+    return f'level_{level}.npy'
+
+def build_pyramid(processor, bbox, out_dir, resolution=0.005, levels=4, verbose=False):
+    """
+    Evaluate processor heat intensity over bbox into a multi-resolution pyramid
+    bbox: (lat_min, lat_max, lng_min, lng_max) in degrees
+    resolution: cell size in degrees at level 0 (the finest level); each further
+    level halves the resolution by averaging 2x2 blocks of the level below.
+    """
+    lat_min, lat_max, lng_min, lng_max = bbox
+    if lat_max <= lat_min or lng_max <= lng_min:
+        raise ValueError('Bounding box must be (lat_min, lat_max, lng_min, lng_max) with min < max')
+    
+    os.makedirs(out_dir, exist_ok=True)
+    levels_dir = tempfile.mkdtemp(dir=out_dir, prefix=LEVELS_PREFIX)
+    os.chmod(levels_dir, 0o755)  # mkdtemp creates 0700; server workers may run as another user
+    
+    try:
+        metadata = _build_levels(processor, bbox, levels_dir, resolution, levels, verbose)
+        metadata['levels_dir'] = os.path.basename(levels_dir)
+        _write_metadata(out_dir, metadata)
+    except BaseException:
+        shutil.rmtree(levels_dir, ignore_errors=True)
+        raise
+    
+    _remove_stale_levels(out_dir, metadata['levels_dir'])
+    return metadata
+
+def _build_levels(processor, bbox, levels_dir, resolution, levels, verbose):
+    lat_min, lat_max, lng_min, lng_max = bbox
+    rows = math.ceil((lat_max - lat_min) / resolution)
+    cols = math.ceil((lng_max - lng_min) / resolution)
+    lngs = lng_min + (np.arange(cols) + 0.5) * resolution
+    
+    base = np.lib.format.open_memmap(
+        os.path.join(levels_dir, _level_file(0)), mode='w+', dtype=np.float32, shape=(rows, cols)
+    )
+    
+    for start in range(0, rows, BUILD_BLOCK_ROWS):
+        stop = min(start + BUILD_BLOCK_ROWS, rows)
+        lats = lat_min + (np.arange(start, stop) + 0.5) * resolution
+        lat_grid, lng_grid = np.meshgrid(lats, lngs, indexing='ij')
+        base[start:stop] = processor.query_many(lat_grid, lng_grid)['heat_index'].reshape(stop - start, cols)
+        
+        if verbose:
+            print(f'level 0: {stop}/{rows} rows')
+    
+    base.flush()
+    level_meta = [{'file': _level_file(0), 'resolution': resolution, 'shape': [rows, cols]}]
+    previous = base
+    
+    for level in range(1, levels):
+        if min(previous.shape) < 2:
+            break
+        
+        current = _downsample(previous, os.path.join(levels_dir, _level_file(level)))
+        level_meta.append({
+            'file': _level_file(level),
+            'resolution': resolution * 2 ** level,
+            'shape': list(current.shape)
+        })
+        previous = current
+        
+        if verbose:
+            print(f'level {level}: {current.shape[0]}x{current.shape[1]}')
+    
+    return {
+        'bbox': [lat_min, lat_max, lng_min, lng_max],
+        'dtype': 'float32',
+        'data_version': processor.data_version,
+        'levels': level_meta
+    }
+
+def _write_metadata(out_dir, metadata):
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    os.chmod(tmp_path, 0o644)  # mkstemp creates 0600
+    os.replace(tmp_path, os.path.join(out_dir, METADATA_FILE))
+
+def _remove_stale_levels(out_dir, keep):
+    """
+    Delete earlier builds, including level files from the old flat layout
+    Servers map every level when they open a pyramid, so unlinking files they
+    still use is safe; one opening concurrently retries with the new metadata.
+    """
+    for name in os.listdir(out_dir):
+        path = os.path.join(out_dir, name)
+        if name.startswith(LEVELS_PREFIX) and name != keep:
+            shutil.rmtree(path, ignore_errors=True)
+        elif name.startswith('level_') and name.endswith('.npy'):
+            os.remove(path)
+
+def _downsample(source, path):
+    """Average 2x2 blocks of source into a new memory-mapped array, edges replicated"""
+    rows, cols = source.shape
+    out_rows, out_cols = math.ceil(rows / 2), math.ceil(cols / 2)
+    target = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(out_rows, out_cols))
+    
+    for start in range(0, out_rows, BUILD_BLOCK_ROWS):
+        stop = min(start + BUILD_BLOCK_ROWS, out_rows)
+        block = np.asarray(source[start * 2:stop * 2], dtype=np.float32)
+        
+        # Pad odd trailing row/column by repeating the edge so every output cell has 4 inputs
+        pad_rows = (stop - start) * 2 - block.shape[0]
+        pad_cols = out_cols * 2 - cols
+        if pad_rows or pad_cols:
+            block = np.pad(block, ((0, pad_rows), (0, pad_cols)), mode='edge')
+        
+        target[start:stop] = block.reshape(stop - start, 2, out_cols, 2).mean(axis=(1, 3))
+    
+    target.flush()
+    return target
+
+def _signature(path):
+    """(mtime_ns, size) of a pyramid's metadata file, None if missing"""
+    try:
+        stat = os.stat(os.path.join(path, METADATA_FILE))
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class HeatRasterPyramid:
+    """
+    Read-only, memory-mapped view over a pyramid written by build_pyramid
+    Every level is mapped on open, so a later rebuild can delete the files.
+    data_version is the heat dataset version the pyramid was computed from
+    (None for pyramids built before it was recorded).
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        
+        for attempt in range(OPEN_ATTEMPTS):
+            self.signature = _signature(path)
+            with open(os.path.join(path, METADATA_FILE), 'r') as f:
+                self.metadata = json.load(f)
+            
+            levels_dir = os.path.join(path, self.metadata.get('levels_dir', ''))
+            try:
+                self._arrays = [
+                    np.load(os.path.join(levels_dir, meta['file']), mmap_mode='r') for meta in self.metadata['levels']
+                ]
+                break
+            except FileNotFoundError:
+                if attempt == OPEN_ATTEMPTS - 1:
+                    raise
+        
+        self.lat_min, self.lat_max, self.lng_min, self.lng_max = self.metadata['bbox']
+        self.levels = self.metadata['levels']
+        self.data_version = self.metadata.get('data_version')
+    
+    @classmethod
+    def exists(cls, path):
+        return os.path.isfile(os.path.join(path, METADATA_FILE))
+    
+    def changed(self):
+        """Whether pyramid.json has been replaced since this pyramid was opened"""
+        signature = _signature(self.path)
+        return signature is not None and signature != self.signature
+    
+    def level_array(self, level):
+        return self._arrays[level]
+    
+    def covers(self, lat_min, lat_max, lng_min, lng_max):
+        return (lat_min >= self.lat_min and lat_max <= self.lat_max and
+                lng_min >= self.lng_min and lng_max <= self.lng_max)
+    
+    def _level_for_step(self, step):
+        """Coarsest level whose resolution is still at least as fine as step"""
+        chosen = 0
+        for level, meta in enumerate(self.levels):
+            if meta['resolution'] <= step * (1 + 1e-9):
+                chosen = level
+        return chosen
+    
+    def window(self, lat_min, lat_max, lng_min, lng_max, max_cells=None):
+        """
+        Slice the cells intersecting a bounding box
+        Picks the finest level whose window fits in max_cells (finest overall
+        when max_cells is None). The returned 'intensity' is a view into the
+        memory map, not a copy. Returns None if the box is outside the pyramid.
+        """
+        lat_min, lng_min = max(lat_min, self.lat_min), max(lng_min, self.lng_min)
+        lat_max, lng_max = min(lat_max, self.lat_max), min(lng_max, self.lng_max)
+        if lat_max <= lat_min or lng_max <= lng_min:
+            return None
+        
+        for level, meta in enumerate(self.levels):
+            res = meta['resolution']
+            rows, cols = meta['shape']
+            r0 = min(rows - 1, int((lat_min - self.lat_min) // res))
+            c0 = min(cols - 1, int((lng_min - self.lng_min) // res))
+            r1 = min(rows, max(r0 + 1, math.ceil((lat_max - self.lat_min) / res)))
+            c1 = min(cols, max(c0 + 1, math.ceil((lng_max - self.lng_min) / res)))
+            
+            if max_cells is None or (r1 - r0) * (c1 - c0) <= max_cells or level == len(self.levels) - 1:
+                return {
+                    'level': level,
+                    'resolution': res,
+                    'origin_lat': self.lat_min + (r0 + 0.5) * res,
+                    'origin_lng': self.lng_min + (c0 + 0.5) * res,
+                    'intensity': self.level_array(level)[r0:r1, c0:c1]
+                }
+    
+    def heatmap_grid(self, center_lat, center_lng, grid_size=20, radius=0.05, as_array=False):
+        """
+        Drop-in for HeatDataProcessor.generate_heatmap_grid backed by the pyramid
+        Returns grid_size x grid_size cells snapped to the raster level closest to
+        the requested spacing, or None if the area is not fully covered. as_array
+        works as in generate_heatmap_grid.
+        """
+        step = radius / grid_size * 2
+        lat_start = center_lat - grid_size / 2 * step
+        lng_start = center_lng - grid_size / 2 * step
+        
+        if not self.covers(lat_start, lat_start + grid_size * step, lng_start, lng_start + grid_size * step):
+            return None
+        
+        level = self._level_for_step(step)
+        res = self.levels[level]['resolution']
+        rows, cols = self.levels[level]['shape']
+        
+        # Stride through a finer level so the window still yields grid_size cells per side
+        stride = max(1, int(step / res + 1e-9))
+        span = grid_size * stride
+        r0 = min(max(0, int((lat_start - self.lat_min) // res)), max(0, rows - span))
+        c0 = min(max(0, int((lng_start - self.lng_min) // res)), max(0, cols - span))
+        
+        intensity = self.level_array(level)[r0:r0 + span:stride, c0:c0 + span:stride]
+        lats = self.lat_min + (np.arange(r0, r0 + span, stride)[:intensity.shape[0]] + 0.5) * res
+        lngs = self.lng_min + (np.arange(c0, c0 + span, stride)[:intensity.shape[1]] + 0.5) * res
+        
+        if as_array:
+            return {
+                'lats': lats,
+                'lngs': lngs,
+                'intensity': intensity
+            }
+        
+        return [
+            {'lat': lat, 'lng': lng, 'intensity': value}
+            for lat, row in zip(lats.tolist(), intensity.tolist())
+            for lng, value in zip(lngs.tolist(), row)
+        ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bbox', type=float, nargs=4, required=True,
+                        metavar=('LAT_MIN', 'LAT_MAX', 'LNG_MIN', 'LNG_MAX'))
+    parser.add_argument('--resolution', type=float, default=0.005, help='Level 0 cell size in degrees')
+    parser.add_argument('--levels', type=int, default=4)
+    parser.add_argument('--data-file', default='data/sample_heat_data.json')
+    parser.add_argument('--interpolation', default='idw')
+    parser.add_argument('--out', default='data/heat_raster')
+    args = parser.parse_args()
+    
+    from heat_data import HeatDataProcessor
+    processor = HeatDataProcessor(args.data_file, interpolation=args.interpolation)
+    metadata = build_pyramid(processor, args.bbox, args.out, args.resolution, args.levels, verbose=True)
+    
+    print(f"Wrote {len(metadata['levels'])} levels to {args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+from PIL import Image
+from cache import LRUCache
+
+TILE_SIZE = 256
+MAX_ZOOM = 18
+
+# Heat colour ramp stops: (intensity, (r, g, b, a))
+COLOR_STOPS = [
+    (0.00, (49, 54, 149, 0)),
+    (0.25, (69, 117, 180, 90)),
+    (0.45, (116, 173, 209, 120)),
+    (0.55, (254, 224, 144, 150)),
+    (0.70, (253, 174, 97, 170)),
+    (0.85, (244, 109, 67, 190)),
+    (1.00, (165, 0, 38, 210))
+]
+
+def build_colormap(stops=COLOR_STOPS):
+    """Interpolate colour stops into a 256-entry RGBA lookup table"""
+    positions = np.array([stop[0] for stop in stops])
+    colors = np.array([stop[1] for stop in stops], dtype=np.float64)
+    levels = np.linspace(0.0, 1.0, 256)
+    
+    table = np.column_stack([np.interp(levels, positions, colors[:, channel]) for channel in range(4)])
+    return np.round(table).astype(np.uint8)
+
+def tile_pixel_centers(z, x, y, samples=TILE_SIZE):
+    """Lat/lng of a samples x samples grid of pixel centres inside an XYZ (Web Mercator) tile"""
+    n = 2 ** z
+    offsets = (np.arange(samples) + 0.5) / samples
+    
+    lngs = (x + offsets) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+    
+    return np.meshgrid(lats, lngs, indexing='ij')
+
+class HeatTileRenderer:
+    """
+    Renders heat intensity into XYZ PNG tiles
+    Tiles go through a bounded in-memory LRU and an on-disk cache keyed by the
+    dataset version and interpolator settings, so a changed (or hot-reloaded)
+    dataset never serves stale tiles. Only tiles up to disk_max_zoom are
+    written to disk; a daemon sweeper thread deletes the trees of other
+    versions, then the least recently written tiles until the cache fits in
+    max_disk_bytes.
+    """
+    
+    def __init__(self, processor, cache_dir='cache/tiles', memory_tiles=512, sample_size=64,
+                 disk_max_zoom=12, max_disk_bytes=None, sweep_interval=300.0):
+        """
+        sample_size: heat values are evaluated on a sample_size^2 grid per tile
+        and bilinearly upscaled to 256x256; heat surfaces are smooth, so this
+        saves (256 / sample_size)^2 lookups per tile.
+        """
+        self.processor = processor
+        self.cache_dir = cache_dir
+        self.sample_size = sample_size
+        self.disk_max_zoom = disk_max_zoom
+        self.max_disk_bytes = max_disk_bytes
+        self.sweep_interval = sweep_interval
+        self.colormap = build_colormap()
+        self.disk_files = None
+        self.disk_bytes = None
+        self.evicted_files = 0
+        self.evicted_versions = 0
+        self.last_sweep_at = None
+        self.last_error = None
+        self._memory = LRUCache(memory_tiles)
+        self._stopped = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        if self._thread is None and self.cache_dir and self.sweep_interval:
+            self._thread = threading.Thread(target=self._run, name='tile-sweeper', daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stopped.set()
+    
+    @property
+    def version(self):
+        return self._version(self.processor.snapshot)
+    
+    def _version(self, snapshot):
+        interpolator = self.processor.interpolator
+        # Options such as k, power or bandwidth_km change every pixel, so they are part of the key
+        options = '-'.join(f'{name}{value}' for name, value in sorted(vars(interpolator).items()))
+        return f'{snapshot.version}-{interpolator.name}-{options}-{self.sample_size}'
+    
+    def etag(self, z, x, y):
+        return f'"{self.version}-{z}-{x}-{y}"'
+    
+    def _path(self, version, z, x, y):
+        if not self.cache_dir or z > self.disk_max_zoom:
+            return None
+        return os.path.join(self.cache_dir, version, str(z), str(x), f'{y}.png')
+    
+    def cached_tile(self, z, x, y):
+        """PNG bytes from memory or disk, or None if the tile still needs rendering"""
+        version = self.version
+        key = (version, z, x, y)
+        png = self._memory.get(key)
+        if png is not None:
+            return png
+        
+        path = self._path(version, z, x, y)
+        if path is None or not os.path.isfile(path):
+            return None
+        
+        with open(path, 'rb') as f:
+            png = f.read()
+        self._memory.put(key, png)
+        return png
+    
+    def render_tile(self, z, x, y):
+        """Render a tile and store it in both caches, without checking them first"""
+        # Pin one snapshot so a concurrent reload cannot file new pixels under the old version
+        snapshot = self.processor.snapshot
+        version = self._version(snapshot)
+        png = self.render(z, x, y, snapshot)
+        path = self._path(version, z, x, y)
+        if path:
+            self._write_atomic(path, png)
+        
+        self._memory.put((version, z, x, y), png)
+        return png
+    
+    def render(self, z, x, y, snapshot=None):
+        """Render one tile to PNG bytes"""
+        lat_grid, lng_grid = tile_pixel_centers(z, x, y, self.sample_size)
+        intensity = self.processor.query_many(lat_grid, lng_grid, snapshot=snapshot)['heat_index']
+        levels = np.clip(intensity * 255 + 0.5, 0, 255).astype(np.uint8).reshape(lat_grid.shape)
+        
+        img = Image.fromarray(self.colormap[levels])
+        if self.sample_size != TILE_SIZE:
+            img = img.resize((TILE_SIZE, TILE_SIZE), Image.BILINEAR)
+        
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG', optimize=False, compress_level=6)
+        return buffer.getvalue()
+    
+    def _write_atomic(self, path, data):
+        """Write via a temp file + rename so concurrent workers never read half a tile"""
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        except OSError:
+            return  # The disk cache is best effort; the sweeper may have just removed this tree
+        
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def _run(self):
+        while not self._stopped.wait(self.sweep_interval):
+            try:
+                self.sweep()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f'{type(e).__name__}: {e}'
+    
+    def sweep(self):
+        """Delete other versions' tiles, then the oldest written until under max_disk_bytes; returns tiles evicted"""
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return 0
+        
+        version = self.version
+        evicted = self.evicted_files
+        entries = []
+        with os.scandir(self.cache_dir) as items:
+            for item in items:
+                if item.name != version:
+                    shutil.rmtree(item.path, ignore_errors=True)
+                    self.evicted_versions += 1
+        
+        for directory, _, files in os.walk(os.path.join(self.cache_dir, version)):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # Replaced or removed since the listing
+                entries.append((stat.st_mtime, stat.st_size, path))
+        
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        if self.max_disk_bytes:
+            oldest = 0
+            while total > self.max_disk_bytes and oldest < len(entries):
+                _, size, path = entries[oldest]
+                try:
+                    os.remove(path)
+                    self.evicted_files += 1
+                except FileNotFoundError:
+                    pass
+                total -= size
+                oldest += 1
+            entries = entries[oldest:]
+        
+        self.disk_files = len(entries)
+        self.disk_bytes = total
+        self.last_sweep_at = time.time()
+        return self.evicted_files - evicted
+    
+    def stats(self):
+        """Memory LRU counters plus the disk cache as of the last sweep"""
+        return {
+            **self._memory.stats(),
+            'disk_files': self.disk_files,
+            'disk_bytes': self.disk_bytes,
+            'max_disk_bytes': self.max_disk_bytes,
+            'disk_max_zoom': self.disk_max_zoom,
+            'evicted_files': self.evicted_files,
+            'evicted_versions': self.evicted_versions,
+            'last_sweep_at': self.last_sweep_at,
+            'last_error': self.last_error
+        }
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
@@ -0,0 +1,296 @@
+"""
+Hourly temperature time series per sample location
+
+Create a store aligned with a heat dataset, then append readings as they arrive:
+    python heat_timeseries.py init --data-file data/sample_heat_data.json --start 2024-01-01T00:00 --out data/heat_timeseries
+    python heat_timeseries.py append --store data/heat_timeseries readings.csv
+    python heat_timeseries.py query --store data/heat_timeseries --lat 19.07 --lng 72.87 --start 2024-05-01 --end 2024-06-01
+
+Readings CSVs have a header and one 'timestamp,location,temperature' row per
+reading, where location is the sample index in the dataset.
+
+The store is append-only. Time is cut into chunks of chunk_hours; each chunk
+is a float32 .npy file shaped (chunk_hours, locations), pre-filled with NaN
+(no reading) and memory-mapped read-only by the server. A time slice across
+every location is one contiguous row, and a range query for a few locations
+only touches the rows it covers, so neither loads the full history.
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import tempfile
+from datetime import datetime, timezone
+import numpy as np
+from numpy.lib.format import open_memmap
+
+METADATA_FILE = 'timeseries.json'
+TIMESERIES_FORMAT = 1
+CHUNK_HOURS = 24 * 7
+STEP_SECONDS = 3600
+
+def parse_time(value):
+    """Epoch seconds from an int/float, a numeric string or an ISO 8601 string (UTC if naive); ValueError otherwise"""
+    if isinstance(value, (int, float)):
+        return _epoch(value)
+    
+    value = str(value).strip()
+    try:
+        number = float(value)
+    except ValueError:
+        pass
+    else:
+        return _epoch(number)
+    
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+def _epoch(number):
+    # int() raises OverflowError for inf and ValueError for NaN; both are bad input here
+    if not math.isfinite(number):
+        raise ValueError(f'Time must be finite, got {number}')
+    return int(number)
+
+def format_time(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def _chunk_file(chunk):
+    return f'chunk_{chunk:06d}.npy'
+
+def summarize(times, values, threshold, step_hours=1.0):
+    """
+    Aggregates of one temperature series, ignoring missing (NaN) hours
+    degree_hours: sum over hours of max(0, temperature - threshold) * step_hours
+    """
+    valid = ~np.isnan(values)
+    readings = int(valid.sum())
+    
+    if not readings:
+        return {'hours': len(values), 'readings': 0, 'max': None, 'mean': None, 'min': None,
+                'degree_hours': 0.0, 'peak_time': None}
+    
+    present = values[valid]
+    peak = int(np.nanargmax(values))
+    return {
+        'hours': len(values),
+        'readings': readings,
+        'max': round(float(present.max()), 2),
+        'mean': round(float(present.mean()), 2),
+        'min': round(float(present.min()), 2),
+        'degree_hours': round(float(np.clip(present - threshold, 0, None).sum() * step_hours), 2),
+        'peak_time': format_time(int(times[peak]))
+    }
+
+class TimeSeriesStore:
+    """
+    Chunked, memory-mapped hourly readings for the sample locations of a dataset
+    Readers refresh metadata when its file changes, so a server sees rows an
+    ingest process appends without reopening the store.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._chunks = {}
+        self._metadata_mtime = None
+        self.refresh()
+    
+    @classmethod
+    def exists(cls, path):
+        return os.path.isfile(os.path.join(path, METADATA_FILE))
+    
+    @classmethod
+    def create(cls, path, locations, start, chunk_hours=CHUNK_HOURS, data_version=None):
+        """Start an empty store; start is rounded down to the hour"""
+        os.makedirs(path, exist_ok=True)
+        start = parse_time(start) // STEP_SECONDS * STEP_SECONDS
+        
+        _write_metadata(path, {
+            'format': TIMESERIES_FORMAT,
+            'locations': int(locations),
+            'start': start,
+            'end': start,
+            'step_seconds': STEP_SECONDS,
+            'chunk_hours': chunk_hours,
+            'data_version': data_version
+        })
+        return cls(path)
+    
+    def refresh(self):
+        """Re-read metadata if an ingest process has rewritten it since the last call"""
+        metadata_path = os.path.join(self.path, METADATA_FILE)
+        mtime = os.stat(metadata_path).st_mtime_ns
+        if mtime == self._metadata_mtime:
+            return
+        
+        with open(metadata_path, 'r') as f:
+            metadata = json.load(f)
+        if metadata.get('format') != TIMESERIES_FORMAT:
+            raise ValueError(f"Unsupported time series format {metadata.get('format')} in {self.path}")
+        
+        self.metadata = metadata
+        self.locations = metadata['locations']
+        self.start = metadata['start']
+        self.end = metadata['end']
+        self.step = metadata['step_seconds']
+        self.chunk_hours = metadata['chunk_hours']
+        self.data_version = metadata.get('data_version')
+        self._metadata_mtime = mtime
+    
+    @property
+    def hours(self):
+        return (self.end - self.start) // self.step
+    
+    def _chunk(self, chunk):
+        """Memory-map a chunk on first use; chunk files are fixed-size, so maps stay valid"""
+        array = self._chunks.get(chunk)
+        if array is None:
+            array = self._chunks[chunk] = np.load(os.path.join(self.path, _chunk_file(chunk)), mmap_mode='r')
+        return array
+    
+    def _hour_range(self, start, end):
+        """Clamp [start, end) epoch seconds to stored hours, as hour offsets"""
+        first = max(0, (parse_time(start) - self.start) // self.step)
+        last = min(self.hours, -(-(parse_time(end) - self.start) // self.step))
+        return first, max(first, last)
+    
+    def values(self, indices, start, end):
+        """
+        Readings for sample indices over [start, end)
+        Returns (epoch times of shape (hours,), float32 values of shape
+        (hours, len(indices))), NaN where no reading was stored.
+        """
+        self.refresh()
+        indices = np.asarray(indices, dtype=np.intp).ravel()
+        first, last = self._hour_range(start, end)
+        out = np.empty((last - first, len(indices)), dtype=np.float32)
+        
+        hour = first
+        while hour < last:
+            chunk, offset = divmod(hour, self.chunk_hours)
+            count = min(last - hour, self.chunk_hours - offset)
+            out[hour - first:hour - first + count] = self._chunk(chunk)[offset:offset + count][:, indices]
+            hour += count
+        
+        times = self.start + np.arange(first, last, dtype=np.int64) * self.step
+        return times, out
+    
+    def at(self, moment, indices=None):
+        """Readings for one hour (all locations, or just indices); None if out of range"""
+        self.refresh()
+        hour = (parse_time(moment) - self.start) // self.step
+        if not 0 <= hour < self.hours:
+            return None
+        
+        chunk, offset = divmod(hour, self.chunk_hours)
+        row = self._chunk(chunk)[offset]
+        return np.array(row if indices is None else row[np.asarray(indices, dtype=np.intp)], dtype=np.float32)
+    
+    def append(self, start, values):
+        """
+        Write (hours, locations) readings starting at start
+        start must be at or after the current end; skipped hours stay NaN.
+        """
+        self.refresh()
+        values = np.asarray(values, dtype=np.float32)
+        if values.ndim != 2 or values.shape[1] != self.locations:
+            raise ValueError(f'Expected readings shaped (hours, {self.locations}), got {values.shape}')
+        
+        first = (parse_time(start) - self.start) // self.step
+        if first < self.hours:
+            raise ValueError(f'Store is append-only; data already ends at {format_time(self.end)}')
+        
+        hour, written = first, 0
+        while written < len(values):
+            chunk, offset = divmod(hour, self.chunk_hours)
+            count = min(len(values) - written, self.chunk_hours - offset)
+            target = self._writable_chunk(chunk)
+            target[offset:offset + count] = values[written:written + count]
+            target.flush()
+            hour += count
+            written += count
+        
+        # Metadata last, so readers never see an end beyond flushed rows
+        metadata = dict(self.metadata, end=self.start + hour * self.step)
+        _write_metadata(self.path, metadata)
+        self.refresh()
+    
+    def _writable_chunk(self, chunk):
+        path = os.path.join(self.path, _chunk_file(chunk))
+        if os.path.isfile(path):
+            return np.load(path, mmap_mode='r+')
+        
+        array = open_memmap(path, mode='w+', dtype=np.float32, shape=(self.chunk_hours, self.locations))
+        array[:] = np.nan
+        return array
+
+def _write_metadata(path, metadata):
+    fd, tmp_path = tempfile.mkstemp(dir=path, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    os.chmod(tmp_path, 0o644)  # mkstemp creates 0600
+    os.replace(tmp_path, os.path.join(path, METADATA_FILE))
+
+def read_readings(path, locations):
+    """Load a long-format readings CSV into (start epoch, (hours, locations) array)"""
+    rows = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            rows.append((parse_time(row['timestamp']) // STEP_SECONDS, int(row['location']), float(row['temperature'])))
+    
+    if not rows:
+        raise ValueError(f'No readings in {path}')
+    
+    hours = np.array([row[0] for row in rows])
+    first = int(hours.min())
+    values = np.full((int(hours.max()) - first + 1, locations), np.nan, dtype=np.float32)
+    values[hours - first, [row[1] for row in rows]] = [row[2] for row in rows]
+    
+    return first * STEP_SECONDS, values
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    init = commands.add_parser('init', help='Create an empty store for a dataset')
+    init.add_argument('--data-file', default='data/sample_heat_data.json')
+    init.add_argument('--start', required=True, help='First hour (ISO 8601 or epoch seconds)')
+    init.add_argument('--chunk-hours', type=int, default=CHUNK_HOURS)
+    init.add_argument('--out', default='data/heat_timeseries')
+    
+    append = commands.add_parser('append', help='Append a readings CSV')
+    append.add_argument('readings')
+    append.add_argument('--store', default='data/heat_timeseries')
+    
+    query = commands.add_parser('query', help='Aggregate exposure at a coordinate')
+    query.add_argument('--store', default='data/heat_timeseries')
+    query.add_argument('--data-file', default='data/sample_heat_data.json')
+    query.add_argument('--lat', type=float, required=True)
+    query.add_argument('--lng', type=float, required=True)
+    query.add_argument('--start', required=True)
+    query.add_argument('--end', required=True)
+    query.add_argument('--threshold', type=float, default=35.0, help='Degree-hours base temperature')
+    args = parser.parse_args()
+    
+    if args.command == 'init':
+        from heat_dataset import HeatDataset
+        dataset = HeatDataset.open(args.data_file)
+        store = TimeSeriesStore.create(args.out, len(dataset), args.start, args.chunk_hours, dataset.version)
+        print(f'Created {args.out} for {store.locations} locations from {format_time(store.start)}')
+    elif args.command == 'append':
+        store = TimeSeriesStore(args.store)
+        start, values = read_readings(args.readings, store.locations)
+        store.append(start, values)
+        print(f'Appended {len(values)} hours; store now ends at {format_time(store.end)}')
+    else:
+        from heat_data import HeatDataProcessor
+        processor = HeatDataProcessor(args.data_file, timeseries=args.store)
+        json.dump(processor.heat_exposure(args.lat, args.lng, args.start, args.end, args.threshold),
+                  sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main()
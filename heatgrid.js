@@ -0,0 +1,21 @@
+// Decoder for the compact heatmap grid returned with ?format=compact
+// (see grid_codec.py): origin/step/dims header + base64 uint8 intensities.
+// Returns the same [{lat, lng, intensity}] list as the legacy format.
+function decodeHeatGrid(grid) {
+    if (!grid || Array.isArray(grid)) return grid || [];
+
+    const bytes = Uint8Array.from(atob(grid.intensity), ch => ch.charCodeAt(0));
+    const [rows, cols] = grid.dims;
+    const [lat0, lng0] = grid.origin;
+    const [dLat, dLng] = grid.step;
+    const [low, high] = grid.scale;
+    const points = new Array(rows * cols);
+
+    for (let r = 0; r < rows; r++) {
+        for (let c = 0; c < cols; c++) {
+            const i = r * cols + c;
+            points[i] = { lat: lat0 + r * dLat, lng: lng0 + c * dLng, intensity: low + bytes[i] / 255 * (high - low) };
+        }
+    }
+    return points;
+}
@@ -0,0 +1,140 @@
+import math
+import numpy as np
+
+# Integer BT.601 luma weights (sum to 256), so luma fits uint16 before the shift
+LUMA_WEIGHTS = (77, 150, 29)
+
+# Neighbouring-pixel luma step that counts as an edge
+EDGE_THRESHOLD = 24
+
+PALETTE_SIZE = 5
+PALETTE_SAMPLES = 4096  # Pixels subsampled for k-means; enough for stable 5-colour palettes
+KMEANS_ITERATIONS = 12
+
+def _srgb_to_linear():
+    """Lookup table from 8-bit sRGB code to linear reflectance in [0, 1]"""
+    c = np.arange(256) / 255.0
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+LINEAR_LUT = _srgb_to_linear()
+
+def luma(strip):
+    """uint8 luma of an (h, w, 3) uint8 array, computed in uint16"""
+    r, g, b = LUMA_WEIGHTS
+    # Widen before multiplying: NumPy 1.x keeps uint8 * uint16 scalar products in uint8
+    channels = strip.astype(np.uint16)
+    weighted = channels[..., 0] * r + channels[..., 1] * g + channels[..., 2] * b
+    return (weighted >> 8).astype(np.uint8)
+
+def kmeans_palette(samples, k=PALETTE_SIZE, iterations=KMEANS_ITERATIONS, seed=0):
+    """
+    k-means colour palette of (n, 3) uint8 samples
+    Seeded k-means++ initialisation, so the same image always gives the same
+    palette. Returns [(rgb tuple, share), ...] sorted by share, largest first.
+    """
+    samples = np.asarray(samples, dtype=np.uint8).reshape(-1, 3)
+    points = samples.astype(np.float32)
+    if len(points) == 0:
+        return []
+    
+    rng = np.random.default_rng(seed)
+    packed = samples[:, 0].astype(np.int32) << 16 | samples[:, 1].astype(np.int32) << 8 | samples[:, 2]
+    k = min(k, len(np.unique(packed)))
+    
+    squared_norms = (points * points).sum(axis=1)
+    
+    def distances(centroids):
+        # |p - c|^2 expanded, so each iteration is one (n, 3) x (3, k) matmul
+        return squared_norms[:, None] - 2 * points @ centroids.T + (centroids * centroids).sum(axis=1)
+    
+    centroids = points[[rng.integers(len(points))]]
+    while len(centroids) < k:
+        nearest = np.maximum(distances(centroids).min(axis=1), 0)
+        centroids = np.vstack([centroids, points[rng.choice(len(points), p=nearest / nearest.sum())]])
+    
+    for _ in range(iterations):
+        labels = distances(centroids).argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.stack([np.bincount(labels, points[:, c], minlength=k) for c in range(3)], axis=1)
+        
+        # Clusters that lost every point keep their previous centre
+        updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centroids)
+        converged = np.abs(updated - centroids).max() < 0.5
+        centroids = updated.astype(np.float32)
+        if converged:
+            break
+    
+    counts = np.bincount(distances(centroids).argmin(axis=1), minlength=k)
+    order = np.argsort(-counts, kind='stable')
+    
+    return [
+        (tuple(int(v) for v in np.clip(np.rint(centroids[i]), 0, 255)), float(counts[i] / len(points)))
+        for i in order if counts[i]
+    ]
+
+class FeatureAccumulator:
+    """
+    Every image statistic the analyzer uses, gathered in one pass over row strips
+    Feed consecutive (h, width, 3) uint8 strips top to bottom with update(),
+    then call result(). Per strip it adds exact integer channel sums and
+    squares, a 256-bin luma histogram, edge counts (carrying the last luma row
+    into the next strip) and a strided pixel subsample for the palette. Only
+    strip-sized uint8/uint16/int16 temporaries are made; nothing full-size.
+    """
+    
+    def __init__(self, width, height, palette_samples=PALETTE_SAMPLES):
+        self.width = width
+        self.height = height
+        self.count = width * height
+        self.channel_sums = np.zeros(3, dtype=np.int64)
+        self.square_sum = 0
+        self.histogram = np.zeros(256, dtype=np.int64)
+        self.edges = 0
+        self.stride = max(1, self.count // palette_samples)
+        self.samples = []
+        self._offset = 0
+        self._previous_row = None
+    
+    def update(self, strip):
+        pixels = strip.reshape(-1, 3)
+        # Columns first: a contiguous reduction over rows, far faster than summing (n, 3) down axis 0
+        self.channel_sums += strip.sum(axis=0, dtype=np.uint32).sum(axis=0, dtype=np.int64)
+        self.square_sum += int(np.square(pixels, dtype=np.uint32).sum(dtype=np.uint64))
+        
+        strip_luma = luma(strip)
+        self.histogram += np.bincount(strip_luma.ravel(), minlength=256)
+        
+        # Edges on the (height - 1) x (width - 1) pixels with a left and an upper neighbour
+        rows = strip_luma.astype(np.int16)
+        if self._previous_row is not None:
+            rows = np.vstack([self._previous_row, rows])
+        if len(rows) > 1 and self.width > 1:
+            dx = np.abs(rows[1:, 1:] - rows[1:, :-1])
+            dy = np.abs(rows[1:, 1:] - rows[:-1, 1:])
+            self.edges += int(np.count_nonzero(np.maximum(dx, dy) > EDGE_THRESHOLD))
+        self._previous_row = rows[-1:]
+        
+        start = -self._offset % self.stride
+        self.samples.append(pixels[start::self.stride].copy())
+        self._offset += len(pixels)
+    
+    def result(self):
+        count = self.count
+        total = int(self.channel_sums.sum())
+        values = count * 3
+        
+        # Exact integer variance, avoids E[x^2] - E[x]^2 cancellation
+        variance = (values * self.square_sum - total * total) / (values * values)
+        edge_positions = (self.height - 1) * (self.width - 1)
+        samples = np.concatenate(self.samples) if self.samples else np.empty((0, 3), dtype=np.uint8)
+        
+        return {
+            'mean': total / values,
+            'std': math.sqrt(max(variance, 0.0)),
+            'channel_means': (self.channel_sums / count).tolist(),
+            'luminance_histogram': self.histogram,
+            'edge_density': self.edges / edge_positions if edge_positions else 0.0,
+            # Mean linear reflectance of the visible band; a proxy, not a calibrated albedo
+            'albedo': float(self.histogram @ LINEAR_LUT) / count,
+            'palette': kmeans_palette(samples)
+        }
@@ -0,0 +1,92 @@
+import numpy as np
+
+# Distances below this (km) count as an exact hit on a sample location
+EXACT_MATCH_KM = 1e-6
+
+class NearestInterpolator:
+    """Snap to the single nearest sample location"""
+    
+    name = 'nearest'
+    
+    def __init__(self):
+        self.k = 1
+    
+    def weights(self, distances_km):
+        return np.ones_like(distances_km)
+
+class IDWInterpolator:
+    """Inverse-distance weighting over the k nearest sample locations"""
+    
+    name = 'idw'
+    
+    def __init__(self, k=4, power=2.0):
+        self.k = k
+        self.power = power
+    
+    def weights(self, distances_km):
+        exact = distances_km <= EXACT_MATCH_KM
+        with np.errstate(divide='ignore'):
+            weights = 1.0 / distances_km ** self.power
+        
+        # A query sitting on a sample point takes that sample's value outright
+        hit_rows = exact.any(axis=1)
+        weights[hit_rows] = exact[hit_rows]
+        return weights
+
+class GaussianKernelInterpolator:
+    """Gaussian-kernel weighting over the k nearest sample locations"""
+    
+    name = 'gaussian'
+    
+    def __init__(self, k=8, bandwidth_km=50.0):
+        self.k = k
+        self.bandwidth_km = bandwidth_km
+    
+    def weights(self, distances_km):
+        # Shift by the nearest distance so remote queries do not underflow to all zeros;
+        # the shift cancels out when the weights are normalised
+        squared = distances_km ** 2
+        shifted = squared - squared.min(axis=1, keepdims=True)
+        return np.exp(-0.5 * shifted / self.bandwidth_km ** 2)
+
+INTERPOLATORS = {
+    NearestInterpolator.name: NearestInterpolator,
+    IDWInterpolator.name: IDWInterpolator,
+    GaussianKernelInterpolator.name: GaussianKernelInterpolator
+}
+
+def get_interpolator(method='idw', **options):
+    """
+    Resolve an interpolator by name, or pass through a ready-made instance
+    Custom interpolators only need a 'k' attribute and a weights(distances_km)
+    method mapping an (n, k) distance matrix to non-negative weights.
+    """
+    if not isinstance(method, str):
+        return method
+    
+    if method not in INTERPOLATORS:
+        raise ValueError(f"Unknown interpolation method '{method}'. Choose from: {', '.join(INTERPOLATORS)}")
+    
+    return INTERPOLATORS[method](**options)
+
+def weighted_average(weights, values):
+    """Row-wise weighted mean of (n, k) values"""
+    return (weights * values).sum(axis=1) / weights.sum(axis=1)
+
+def coordinate_noise(lats, lngs, amplitude=2.0, seed=0):
+    """
+    Deterministic pseudo-random offsets in [-amplitude, amplitude) per coordinate
+    Returns a flat array with one offset per (flattened) coordinate.
+    Coordinates are quantised to 1e-6 degrees and hashed (splitmix64), so the
+    same location always gets the same offset, across processes and restarts.
+    """
+    lat_q = np.round(np.asarray(lats, dtype=np.float64).ravel() * 1e6).astype(np.int64).view(np.uint64)
+    lng_q = np.round(np.asarray(lngs, dtype=np.float64).ravel() * 1e6).astype(np.int64).view(np.uint64)
+    
+    h = lat_q * np.uint64(0x9E3779B97F4A7C15) ^ lng_q ^ np.uint64(seed & 0xFFFFFFFFFFFFFFFF)
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    h = h ^ (h >> np.uint64(31))
+    
+    unit = (h >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+    return amplitude * (2 * unit - 1)
@@ -0,0 +1,158 @@
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_METRIC = 'heatwatch_stage_seconds'
+_NULL_TIMER = nullcontext()
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + pairs + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Timer:
+    __slots__ = ('registry', 'name', 'labels', 'start')
+    
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+class MetricsRegistry:
+    """
+    In-process counters and latency histograms rendered as Prometheus text
+    Collectors are callables run at scrape time that return
+    (name, type, help, [(labels dict, value), ...]) tuples, for values that
+    already live elsewhere such as cache hit counters. When disabled, timers
+    are a shared no-op context manager and observations return immediately.
+    """
+    
+    def __init__(self, enabled=True, buckets=LATENCY_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+    
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+    
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][bucket] += 1
+            histogram[1] += value
+            histogram[2] += 1
+    
+    def timer(self, name, **labels):
+        """Context manager observing its wall time into histogram name"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+    
+    def stage(self, stage):
+        """Timer for one named stage of a hot path"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, STAGE_METRIC, {'stage': stage})
+    
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+    
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+    
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h[0]), h[1], h[2])) for key, h in self._histograms.items())
+        
+        lines = []
+        seen = set()
+        
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f'# HELP {name} {self._help[name]}')
+                lines.append(f'# TYPE {name} {kind}')
+        
+        for (name, labels), value in counters:
+            header(name, 'counter')
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        
+        for (name, labels), (counts, total, count) in histograms:
+            header(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                le = bound if bound == '+Inf' else repr(float(bound))
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+            lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                self._help.setdefault(name, help_text)
+                header(name, kind)
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}')
+        
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry(enabled=os.environ.get('METRICS_ENABLED', '1') != '0')
+REGISTRY.describe(STAGE_METRIC, 'Wall time of instrumented hot-path stages')
+
+def stage(name):
+    """Time a block as a stage in the default registry"""
+    return REGISTRY.stage(name)
+
+def timed(name):
+    """Decorator timing every call as a stage in the default registry"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return fn(*args, **kwargs)
+            with _Timer(REGISTRY, STAGE_METRIC, {'stage': name}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
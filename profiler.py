@@ -0,0 +1,95 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+class SamplingProfiler:
+    """
+    Opt-in wall-clock sampler that dumps folded stacks for slow requests
+    While at least one request is being traced, a daemon thread snapshots
+    every thread's stack each interval seconds via sys._current_frames().
+    Requests slower than threshold_ms write the stacks sampled during their
+    lifetime to out_dir as 'thread;frame;frame count' lines, the collapsed
+    format read by flamegraph.pl, speedscope and inferno. Work offloaded to
+    the analysis pool shows up under its own thread name; with concurrent
+    requests, samples of pool threads may belong to a neighbour.
+    """
+    
+    def __init__(self, threshold_ms=500, interval=0.005, out_dir='cache/profiles', max_depth=64):
+        self.threshold_ms = threshold_ms
+        self.interval = interval
+        self.out_dir = out_dir
+        self.max_depth = max_depth
+        self.dumps = 0
+        self._active = {}  # trace id -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._next_id = 0
+        self._thread = None
+    
+    def start(self):
+        """Begin tracing the current request, returns a trace id for stop()"""
+        with self._lock:
+            self._next_id += 1
+            trace_id = self._next_id
+            self._active[trace_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return trace_id, time.perf_counter()
+    
+    def stop(self, trace, label):
+        """End a trace; dumps its stacks if the request was slow. Returns the dump path or None"""
+        trace_id, started = trace
+        with self._lock:
+            stacks = self._active.pop(trace_id, None)
+            if not self._active:
+                self._wake.clear()
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if stacks is None or elapsed_ms < self.threshold_ms or not stacks:
+            return None
+        
+        return self._dump(stacks, f'{trace_id}-{label}', elapsed_ms)
+    
+    def _run(self):
+        own_ident = threading.get_ident()
+        while True:
+            self._wake.wait()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            
+            sample = Counter()
+            for ident, frame in frames.items():
+                if ident != own_ident:
+                    sample[self._fold(names.get(ident, str(ident)), frame)] += 1
+            
+            with self._lock:
+                for stacks in self._active.values():
+                    stacks.update(sample)
+            
+            time.sleep(self.interval)
+    
+    def _fold(self, thread_name, frame):
+        parts = []
+        while frame is not None and len(parts) < self.max_depth:
+            code = frame.f_code
+            parts.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+            frame = frame.f_back
+        parts.append(thread_name)
+        return ';'.join(reversed(parts))
+    
+    def _dump(self, stacks, label, elapsed_ms):
+        os.makedirs(self.out_dir, exist_ok=True)
+        safe_label = re.sub(r'[^A-Za-z0-9_.-]+', '_', label).strip('_') or 'request'
+        path = os.path.join(self.out_dir, f'{time.strftime("%Y%m%d-%H%M%S")}-{int(elapsed_ms)}ms-{safe_label}.folded')
+        
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        
+        self.dumps += 1
+        return path
@@ -1,6 +1,201 @@
+import json
+import operator
+from bisect import bisect_right
+from collections import namedtuple
+from string import Formatter
+import numpy as np
+from metrics import timed
+
+# Verdict texts indexed by verdict code, lowest suitability first
+VERDICTS = (
+    "Not recommended - high heat stress area",
+    "Moderate location - significant heat mitigation required",
+    "Good location with minor heat considerations",
+    "Excellent location for construction"
+)
+
+# Minimum suitability score for verdict codes 1, 2 and 3
+VERDICT_THRESHOLDS = (40, 60, 80)
+
+FEATURE_FACTORS = ('size_factor', 'absorption_factor', 'design_factor')
+
+DEFAULT_RULES_FILE = 'data/recommendation_rules.json'
+
+RULE_SECTIONS = ('recommendations', 'insights', 'mitigations')
+
+RULE_OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+Rule = namedtuple('Rule', ['id', 'group', 'conditions', 'output', 'is_template'])
+
+def _template_fields(value):
+    """Names of {placeholders} anywhere inside a rule output"""
+    if isinstance(value, str):
+        return {field for _, field, _, _ in Formatter().parse(value) if field}
+    if isinstance(value, dict):
+        return set().union(*(_template_fields(item) for item in value.values()))
+    return set()
+
+def _render(value, context):
+    if isinstance(value, str):
+        return value.format_map(context)
+    return {key: _render(item, context) for key, item in value.items()}
+
+class RuleSet:
+    """
+    Declarative recommendation rules, compiled once into shared outputs
+    Each section is an ordered list of rules with 'id', optional 'group',
+    'when' conditions ("field op value", all must hold) and an 'output'.
+    Within a group only the first matching rule fires, like an if/elif chain.
+    Fields are heat_index, temperature, risk_level, score or features.<name>.
+    Outputs may use {field} placeholders, rendered per call; everything else
+    is shared between calls and must be treated as read-only.
+    """
+    
+    def __init__(self, rules):
+        self.max_insights = rules.get('max_insights', 2)
+        self._predicates = []
+        self._sections = {}
+        self._memo = {}
+        self.memo_hits = 0
+        self.memo_misses = 0
+        predicate_ids = {}
+        
+        for section in RULE_SECTIONS:
+            self._sections[section] = tuple(
+                Rule(
+                    rule['id'],
+                    rule.get('group'),
+                    tuple(self._compile_condition(text, predicate_ids) for text in rule.get('when', [])),
+                    rule['output'],
+                    bool(_template_fields(rule['output']))
+                )
+                for rule in rules.get(section, [])
+            )
+    
+    @classmethod
+    def from_file(cls, path=DEFAULT_RULES_FILE):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+    
+    def _compile_condition(self, text, predicate_ids):
+        """Parse "field op value" into a shared predicate id"""
+        try:
+            field, op, raw = text.split(None, 2)
+            compare = RULE_OPERATORS[op]
+        except (ValueError, KeyError):
+            raise ValueError(f"Invalid rule condition '{text}'")
+        
+        try:
+            value = float(raw)
+        except ValueError:
+            value = raw
+        
+        key = (field, op, value)
+        if key not in predicate_ids:
+            predicate_ids[key] = len(self._predicates)
+            self._predicates.append((field.split('.', 1), compare, value))
+        return predicate_ids[key]
+    
+    def _signature(self, context):
+        """Truth value of every distinct predicate, the complete input to rule firing"""
+        signature = []
+        for path, compare, value in self._predicates:
+            actual = context.get(path[0])
+            if len(path) == 2:
+                actual = actual.get(path[1]) if actual else None
+            try:
+                signature.append(actual is not None and compare(actual, value))
+            except TypeError:
+                signature.append(False)
+        return tuple(signature)
+    
+    def _fire(self, signature):
+        """Resolve which rules fire for a signature, keeping static outputs as shared objects"""
+        fired = {'ids': {}}
+        is_template = False
+        
+        for section, rules in self._sections.items():
+            taken_groups = set()
+            matches = []
+            for rule in rules:
+                if rule.group in taken_groups or not all(signature[i] for i in rule.conditions):
+                    continue
+                if rule.group:
+                    taken_groups.add(rule.group)
+                matches.append(rule)
+            
+            if section == 'insights':
+                matches = matches[:self.max_insights]
+            
+            is_template = is_template or any(rule.is_template for rule in matches)
+            fired[section] = tuple(rule if rule.is_template else rule.output for rule in matches)
+            fired['ids'][section] = tuple(rule.id for rule in matches)
+        
+        fired['is_template'] = is_template
+        if not is_template:
+            fired['result'] = (fired['recommendations'], " ".join(fired['insights']), fired['mitigations'])
+        return fired
+    
+    def evaluate(self, context):
+        """
+        Fired rule outputs per section for a context dict
+        Memoized on the predicate signature, so the memo holds at most one entry
+        per combination of predicate outcomes whatever values callers send, and
+        repeated inputs allocate nothing beyond the signature tuple.
+        """
+        signature = self._signature(context)
+        fired = self._memo.get(signature)
+        if fired is None:
+            self.memo_misses += 1
+            fired = self._memo[signature] = self._fire(signature)
+        else:
+            self.memo_hits += 1
+        return fired
+    
+    def fired_ids(self, context):
+        """Ids of the rules that fire for a context, per section"""
+        return self.evaluate(context)['ids']
+    
+    def apply(self, context):
+        """Return (recommendations, expert insight text, mitigation strategies)"""
+        fired = self.evaluate(context)
+        
+        if not fired['is_template']:
+            return fired['result']
+        
+        # Only rules with {placeholders} are rendered; the rest stay shared
+        fired = {
+            section: tuple(
+                _render(item.output, context) if isinstance(item, Rule) else item
+                for item in fired[section]
+            )
+            for section in RULE_SECTIONS
+        }
+        
+        return fired['recommendations'], " ".join(fired['insights']), fired['mitigations']
+    
+    def stats(self):
+        """Memo size and hit/miss counters"""
+        return {
+            'size': len(self._memo),
+            'hits': self.memo_hits,
+            'misses': self.memo_misses
+        }
+
 class RecommendationEngine:
     """Generates building recommendations based on heat data and building analysis"""
     
+    def __init__(self, rules_file=DEFAULT_RULES_FILE):
+        self.rules = RuleSet.from_file(rules_file)
+    
+    @timed('recommendations.generate')
     def generate_recommendations(self, heat_data, building_features):
         """
         Generate comprehensive recommendations for building construction
@@ -8,17 +203,14 @@ class RecommendationEngine:
         # Calculate overall suitability score
         suitability_score = self._calculate_suitability(heat_data, building_features)
         
-        # Generate specific recommendations
-        recommendations = self._generate_specific_recommendations(
-            heat_data, building_features, suitability_score
+        # Evaluate the compiled rule table once for recommendations, insight and mitigations
+        recommendations, expert_insight, mitigation_strategies = self.rules.apply(
+            self._rule_context(heat_data, building_features, suitability_score)
         )
         
         # Determine if construction is advisable
         is_advisable = suitability_score >= 60
         
-        # Generate expert insight (rationale)
-        expert_insight = self._generate_expert_insight(heat_data, building_features, suitability_score)
-        
         result = {
             'suitability_score': suitability_score,
             'is_advisable': is_advisable,
@@ -26,7 +218,7 @@ class RecommendationEngine:
             'expert_insight': expert_insight,
             'heat_risk_level': heat_data['risk_level'],
             'recommendations': recommendations,
-            'mitigation_strategies': self._get_mitigation_strategies(heat_data, building_features)
+            'mitigation_strategies': mitigation_strategies
         }
         
         return result
@@ -56,138 +248,62 @@ class RecommendationEngine:
         # Ensure score is within 0-100
         return max(0, min(100, round(base_score, 1)))
     
+    @timed('recommendations.score_many')
+    def score_many(self, heat_index, building_features=None):
+        """
+        Vectorized _calculate_suitability / _get_verdict over many sites
+        heat_index: array of heat indices
+        building_features: None, one features dict applied to every site, or a
+        sequence with a features dict (or None) per site
+        Returns arrays 'suitability_score', 'verdict_code' (index into VERDICTS)
+        and 'is_advisable'.
+        """
+        heat_index = np.asarray(heat_index, dtype=np.float64)
+        score = 100 - heat_index * 40
+        
+        if building_features:
+            factors = self._feature_factor_arrays(building_features, heat_index.shape)
+            score = score - (factors['size_factor'] - 1.0) * 10
+            score = score - (factors['absorption_factor'] - 1.0) * 15
+            score = score + (1.0 - factors['design_factor']) * 10
+        
+        score = np.clip(np.round(score, 1), 0, 100)
+        
+        return {
+            'suitability_score': score,
+            'verdict_code': self.verdict_codes(score),
+            'is_advisable': score >= 60
+        }
+    
+    def _feature_factor_arrays(self, building_features, shape):
+        """Turn one features dict or a per-site sequence of them into factor arrays"""
+        if isinstance(building_features, dict):
+            return {
+                name: np.full(shape, building_features.get(name, 1.0), dtype=np.float64)
+                for name in FEATURE_FACTORS
+            }
+        
+        return {
+            name: np.array(
+                [(features or {}).get(name, 1.0) for features in building_features], dtype=np.float64
+            ).reshape(shape)
+            for name in FEATURE_FACTORS
+        }
+    
+    def verdict_codes(self, scores):
+        """Verdict code per score, see VERDICTS"""
+        return np.searchsorted(VERDICT_THRESHOLDS, scores, side='right')
+    
     def _get_verdict(self, score):
         """Get verdict text based on suitability score"""
-        if score >= 80:
-            return "Excellent location for construction"
-        elif score >= 60:
-            return "Good location with minor heat considerations"
-        elif score >= 40:
-            return "Moderate location - significant heat mitigation required"
-        else:
-            return "Not recommended - high heat stress area"
-    
-    def _generate_specific_recommendations(self, heat_data, building_features, score):
-        """Generate specific actionable recommendations"""
-        recs = []
-        
-        # Heat-based recommendations
-        if heat_data['heat_index'] >= 0.75:
-            recs.append({
-                'category': 'Critical',
-                'title': 'High Heat Zone',
-                'description': 'This area experiences severe urban heat island effect. Cooling systems will require significant capacity.',
-                'priority': 'high'
-            })
-        elif heat_data['heat_index'] >= 0.50:
-            recs.append({
-                'category': 'Important',
-                'title': 'Moderate Heat Zone',
-                'description': 'Moderate heat island effect detected. Plan for enhanced ventilation and cooling.',
-                'priority': 'medium'
-            })
-        
-        # Building-specific recommendations
-        if building_features:
-            if building_features.get('heat_absorption') == 'high':
-                recs.append({
-                    'category': 'Material Selection',
-                    'title': 'Use Reflective Materials',
-                    'description': 'Current design shows dark colors. Use light-colored, reflective roofing and exterior materials to reduce heat absorption.',
-                    'priority': 'high'
-                })
-            
-            if building_features.get('estimated_size') == 'large':
-                recs.append({
-                    'category': 'Design',
-                    'title': 'Enhanced Cooling System',
-                    'description': 'Large building footprint requires robust HVAC system designed for high ambient temperatures.',
-                    'priority': 'medium'
-                })
-            
-            if building_features.get('design_quality') == 'basic':
-                recs.append({
-                    'category': 'Design',
-                    'title': 'Improve Ventilation Design',
-                    'description': 'Consider adding cross-ventilation features, ventilation shafts, or green spaces to improve natural cooling.',
-                    'priority': 'medium'
-                })
-        
-        # Temperature-based recommendations
-        if heat_data['temperature'] > 36:
-            recs.append({
-                'category': 'Climate Adaptation',
-                'title': 'Heat-Resilient Construction',
-                'description': f'Area temperature ({heat_data["temperature"]}°C) requires heat-resistant materials and superior insulation.',
-                'priority': 'high'
-            })
-        
-        return recs
-    
-    def _generate_expert_insight(self, heat_data, building_features, score):
-        """Generate a concise expert analysis justifying the score"""
-        insights = []
-        
-        # Risk levels
-        if heat_data['heat_index'] > 0.8:
-            insights.append("At this heat level, building traditional high-rises can create a 'vertical oven' effect where upper floors trap heat from the dense city core, making cooling costs unsustainable.")
-        elif heat_data['heat_index'] > 0.5:
-            insights.append("This moderate heat zone suggests that while construction is viable, placing high-density residential units here without extensive green buffers will lead to 'thermal discomfort' for lower-floor residents during peak summer.")
-        else:
-            insights.append("This is a 'Cool Pocket'—ideal for sustainable development. You have more flexibility with materials without risking severe heat retention.")
-
-        # Building features (if available)
-        if building_features:
-            if building_features.get('estimated_size') == 'large' and heat_data['heat_index'] > 0.7:
-                insights.append("For a 5+ storey proposal in this hotspot, reconsider the ground floor layout; heat trapped at street level will significantly impact livability for ground-floor commercial or residential units.")
-            
-            if building_features.get('heat_absorption') == 'high':
-                insights.append("Your current schematic suggests a high-absorption exterior. In this specific climate zone, that color choice alone could increase interior temperatures by 4-6°C compared to local benchmarks.")
-
-        if score < 40:
-            insights.append("Strategic Warning: Building here without a complete redesign (e.g., pilotis for air flow, massive vertical greening) is likely to result in a 'failed building' status from an environmental efficiency standpoint.")
-        elif score > 80:
-            insights.append("Pro Tip: This site is a rare 'Thermal Asset'. Use this to market the property's natural cooling efficiency and low long-term energy footprint.")
-
-        return " ".join(insights[:2]) # Keep it concise as requested
-
-    def _get_mitigation_strategies(self, heat_data, building_features):
-        """Get mitigation strategies to reduce heat impact"""
-        strategies = []
-        
-        # Universal strategies
-        strategies.append({
-            'strategy': 'Green Roof Installation',
-            'benefit': 'Reduces roof temperature by 20-30°C and provides insulation',
-            'effectiveness': 'High'
-        })
-        
-        strategies.append({
-            'strategy': 'Vertical Gardens',
-            'benefit': 'Cools building perimeter and improves air quality',
-            'effectiveness': 'Medium'
-        })
-        
-        # Heat-specific strategies
-        if heat_data['heat_index'] > 0.6:
-            strategies.append({
-                'strategy': 'Double-Glazed Windows',
-                'benefit': 'Reduces heat transfer by 40-50%',
-                'effectiveness': 'High'
-            })
-            
-            strategies.append({
-                'strategy': 'Strategic Shading',
-                'benefit': 'Use overhangs, louvers, and external shading devices',
-                'effectiveness': 'High'
-            })
-        
-        # Building-specific strategies
-        if building_features and building_features.get('heat_absorption') == 'high':
-            strategies.append({
-                'strategy': 'Cool Roof Coating',
-                'benefit': 'Reflective coating can reduce surface temperature by 20-25°C',
-                'effectiveness': 'Very High'
-            })
-        
-        return strategies
+        return VERDICTS[bisect_right(VERDICT_THRESHOLDS, score)]
+    
+    def _rule_context(self, heat_data, building_features, score):
+        """Fields the rule table can test and template"""
+        return {
+            'heat_index': heat_data['heat_index'],
+            'temperature': heat_data['temperature'],
+            'risk_level': heat_data.get('risk_level'),
+            'score': score,
+            'features': building_features
+        }
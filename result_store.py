@@ -0,0 +1,83 @@
+import secrets
+import sqlite3
+import threading
+import time
+from cache import LRUCache
+
+# Expired SQLite rows are purged once every this many writes
+PURGE_INTERVAL = 256
+
+class ResultStore:
+    """
+    Server-side store for serialized analysis results
+    Payloads are kept as ready-to-send JSON strings under short random IDs,
+    so only the ID needs to live in the session cookie. Entries expire after
+    ttl seconds; the in-process LRU bounds memory and the optional SQLite
+    file lets every worker answer for results produced by any other.
+    """
+    
+    def __init__(self, maxsize=4096, ttl=3600, db_path=None):
+        self.ttl = ttl
+        self._memory = LRUCache(maxsize)
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS results '
+                '(id TEXT PRIMARY KEY, expires_at REAL NOT NULL, payload TEXT NOT NULL)'
+            )
+            self._db.commit()
+    
+    def put(self, payload):
+        """Store a serialized JSON payload and return its ID"""
+        result_id = secrets.token_urlsafe(12)
+        expires_at = time.time() + self.ttl
+        self._memory.put(result_id, (expires_at, payload))
+        
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO results (id, expires_at, payload) VALUES (?, ?, ?)',
+                    (result_id, expires_at, payload)
+                )
+                self._writes += 1
+                if self._writes % PURGE_INTERVAL == 0:
+                    self._db.execute('DELETE FROM results WHERE expires_at < ?', (time.time(),))
+                self._db.commit()
+        
+        return result_id
+    
+    def get(self, result_id):
+        """Return the stored payload, or None if unknown or expired"""
+        if not result_id:
+            return None
+        
+        entry = self._memory.get(result_id)
+        
+        if entry is None and self._db is not None:
+            with self._db_lock:
+                entry = self._db.execute(
+                    'SELECT expires_at, payload FROM results WHERE id = ?', (result_id,)
+                ).fetchone()
+            if entry is not None:
+                self._memory.put(result_id, tuple(entry))
+        
+        if entry is None:
+            return None
+        
+        expires_at, payload = entry
+        if expires_at < time.time():
+            self._memory.pop(result_id)
+            return None
+        
+        return payload
+    
+    def stats(self):
+        return {
+            'ttl': self.ttl,
+            'memory': self._memory.stats(),
+            'persistent': self._db is not None
+        }
@@ -1,30 +1,201 @@
-from flask import Flask, request, jsonify, send_from_directory, session
+from flask import Flask, request, jsonify, send_from_directory, session, Response, stream_with_context, g
+import csv
+import hmac
+import io
+import json
+import math
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
-from heat_data import HeatDataProcessor
-from building_analyzer import BuildingAnalyzer
-from recommendations import RecommendationEngine
+from heat_data import HeatDataProcessor, RISK_LEVELS
+from dataset_watcher import DatasetWatcher
+from heat_raster import HeatRasterPyramid
+from heat_timeseries import parse_time
+from suitability_index import SuitabilityIndex
+from heat_tiles import HeatTileRenderer, valid_tile
+from building_analyzer import BuildingAnalyzer, FEATURES_VERSION
+from analysis_cache import AnalysisCache
+from upload_store import UploadStore
+from result_store import ResultStore
+from recommendations import RecommendationEngine, VERDICTS, FEATURE_FACTORS
+from task_pool import BoundedExecutor, ServerBusy
+from metrics import REGISTRY, stage
+from grid_codec import GRID_MEDIA_TYPE, encode_compact, decode_compact, grid_points, is_compact
+from compression import compress_response
+from profiler import SamplingProfiler
 
 app = Flask(__name__, static_folder='static')
 app.secret_key = os.environ.get('SECRET_KEY', 'default-dev-key')  # Change in production
 
 # Configuration
-UPLOAD_FOLDER = 'uploads'
+UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'uploads')  # Content-addressed store of uploaded images
+UPLOAD_STORE_MAX_BYTES = int(os.environ.get('UPLOAD_STORE_MAX_BYTES', 1024 ** 3))
+UPLOAD_MAX_AGE = float(os.environ.get('UPLOAD_MAX_AGE', 7 * 24 * 60 * 60))  # Seconds an upload is kept, 0 for no limit
+UPLOAD_SWEEP_INTERVAL = float(os.environ.get('UPLOAD_SWEEP_INTERVAL', 60))  # Seconds between eviction sweeps, 0 to disable
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
+BATCH_MAX_BYTES = int(os.environ.get('BATCH_MAX_BYTES', 1024 ** 3))  # Request body limit for /api/upload-batch
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', 5000))
+HEAT_DATA_FILE = os.environ.get('HEAT_DATA_FILE', 'data/sample_heat_data.json')  # JSON or a heat_dataset.py directory
+DATA_WATCH_INTERVAL = float(os.environ.get('DATA_WATCH_INTERVAL', 5))  # Seconds between data file checks, 0 to disable
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')  # Enables /api/admin/* when set
+HEAT_CACHE_SIZE = int(os.environ.get('HEAT_CACHE_SIZE', 4096))  # Point lookups kept by HeatDataProcessor
+HEAT_CACHE_PRECISION = int(os.environ.get('HEAT_CACHE_PRECISION', 4))  # Decimal places, 4 is ~11 m
+HEAT_RASTER_PATH = os.environ.get('HEAT_RASTER_PATH', 'data/heat_raster')  # Built by heat_raster.py
+HEAT_TIMESERIES_PATH = os.environ.get('HEAT_TIMESERIES_PATH', 'data/heat_timeseries')  # Built by heat_timeseries.py
+MAX_SERIES_HOURS = 24 * 366  # Longest window /api/heat-timeseries returns hour by hour
+SUITABILITY_INDEX_PATH = os.environ.get('SUITABILITY_INDEX_PATH', 'data/suitability_index')  # Built by suitability_index.py
+MAX_TOP_CELLS = 1000
+MAX_RASTER_CELLS = 250000
+RECOMMENDATION_RULES = os.environ.get('RECOMMENDATION_RULES', 'data/recommendation_rules.json')
+TILE_CACHE_FOLDER = os.environ.get('TILE_CACHE_FOLDER', 'cache/tiles')
+TILE_CACHE_MAX_BYTES = int(os.environ.get('TILE_CACHE_MAX_BYTES', 512 * 1024 ** 2))
+TILE_DISK_MAX_ZOOM = int(os.environ.get('TILE_DISK_MAX_ZOOM', 12))  # Deeper tiles are only cached in memory
+TILE_SWEEP_INTERVAL = float(os.environ.get('TILE_SWEEP_INTERVAL', 300))  # Seconds between tile cache sweeps, 0 to disable
+TILE_MAX_AGE = 24 * 60 * 60  # Seconds browsers may reuse a heat tile
+ANALYSIS_CACHE_SIZE = int(os.environ.get('ANALYSIS_CACHE_SIZE', 1024))
+ANALYSIS_CACHE_DB = os.environ.get('ANALYSIS_CACHE_DB')  # Optional SQLite file shared by workers
+RESULT_STORE_SIZE = int(os.environ.get('RESULT_STORE_SIZE', 4096))
+RESULT_TTL = int(os.environ.get('RESULT_TTL', 60 * 60))  # Seconds an analysis stays retrievable
+RESULT_STORE_DB = os.environ.get('RESULT_STORE_DB')  # Optional SQLite file shared by workers
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))
+BATCH_CHUNKSIZE = int(os.environ.get('BATCH_CHUNKSIZE', 8))
+ANALYSIS_CONCURRENCY = int(os.environ.get('ANALYSIS_CONCURRENCY', os.cpu_count() or 1))
+ANALYSIS_QUEUE_DEPTH = int(os.environ.get('ANALYSIS_QUEUE_DEPTH', 2 * ANALYSIS_CONCURRENCY))
+ANALYSIS_TIMEOUT = float(os.environ.get('ANALYSIS_TIMEOUT', 60))  # Seconds to wait on a queued analysis
+TILE_CONCURRENCY = int(os.environ.get('TILE_CONCURRENCY', os.cpu_count() or 1))
+TILE_QUEUE_DEPTH = int(os.environ.get('TILE_QUEUE_DEPTH', 64))  # A map view requests a few dozen tiles at once
+BUSY_RETRY_AFTER = 2  # Seconds clients should back off when a pool queue is full
+SCORE_CHUNK_SIZE = 10000  # Sites scored per vectorized batch in /api/score-sites
+MAX_SCORE_DETAILS = 100  # Sites per request that may ask for full recommendation text
+PROFILE_SLOW_MS = os.environ.get('PROFILE_SLOW_MS')  # Set to dump sampled stacks of slower requests
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'cache/profiles')
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
 # Initialize processors
-heat_processor = HeatDataProcessor()
+heat_processor = HeatDataProcessor(
+    HEAT_DATA_FILE, cache_size=HEAT_CACHE_SIZE, cache_precision=HEAT_CACHE_PRECISION,
+    timeseries=HEAT_TIMESERIES_PATH
+)
+dataset_watcher = DatasetWatcher(heat_processor, DATA_WATCH_INTERVAL or None).start()
 building_analyzer = BuildingAnalyzer()
-recommendation_engine = RecommendationEngine()
+upload_store = UploadStore(UPLOAD_FOLDER, UPLOAD_STORE_MAX_BYTES, UPLOAD_MAX_AGE, UPLOAD_SWEEP_INTERVAL).start()
+analysis_cache = AnalysisCache(
+    ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_DB, namespace=f'max_pixels={building_analyzer.max_pixels},features={FEATURES_VERSION}'
+)
+recommendation_engine = RecommendationEngine(RECOMMENDATION_RULES)
+result_store = ResultStore(RESULT_STORE_SIZE, RESULT_TTL, RESULT_STORE_DB)
+analysis_pool = BoundedExecutor(ANALYSIS_CONCURRENCY, ANALYSIS_QUEUE_DEPTH, ANALYSIS_TIMEOUT)
+tile_pool = BoundedExecutor(TILE_CONCURRENCY, TILE_QUEUE_DEPTH, ANALYSIS_TIMEOUT, name='tile')
+batch_executor = None  # Process pool for /api/upload-batch, started on first use
+heat_tiles = HeatTileRenderer(heat_processor, cache_dir=TILE_CACHE_FOLDER, disk_max_zoom=TILE_DISK_MAX_ZOOM,
+                              max_disk_bytes=TILE_CACHE_MAX_BYTES, sweep_interval=TILE_SWEEP_INTERVAL).start()
+heat_raster = HeatRasterPyramid(HEAT_RASTER_PATH) if HeatRasterPyramid.exists(HEAT_RASTER_PATH) else None
+suitability_index = SuitabilityIndex(SUITABILITY_INDEX_PATH) if SuitabilityIndex.exists(SUITABILITY_INDEX_PATH) else None
+profiler = SamplingProfiler(float(PROFILE_SLOW_MS), out_dir=PROFILE_DIR) if PROFILE_SLOW_MS else None
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def busy_response(error):
+    """503 with Retry-After when the analysis queue is saturated"""
+    response = jsonify({'error': str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(BUSY_RETRY_AFTER)
+    return response
+
+@app.errorhandler(ServerBusy)
+def handle_server_busy(error):
+    return busy_response(error)
+
+@app.errorhandler(RequestEntityTooLarge)
+def handle_too_large(error):
+    return jsonify({'error': 'Upload too large'}), 413
+
+REGISTRY.describe('heatwatch_http_requests_total', 'HTTP requests by route, method and status')
+REGISTRY.describe('heatwatch_http_request_seconds', 'HTTP request latency by route')
+REGISTRY.describe('heatwatch_http_request_bytes_total', 'Request body bytes received by route')
+REGISTRY.describe('heatwatch_http_response_bytes_total', 'Response body bytes sent by route (non-streamed responses)')
+
+def cache_metrics():
+    """Scrape-time view of the cache and pool counters kept by each component"""
+    caches = {
+        'analysis': analysis_cache.stats(),
+        'heat_tiles': heat_tiles.stats(),
+        'results': result_store.stats()['memory'],
+        'recommendation_rules': recommendation_engine.rules.stats()
+    }
+    heat_lookup = heat_processor.cache_stats()
+    if heat_lookup['enabled']:
+        caches['heat_lookup'] = heat_lookup
+    pools = {'analysis': analysis_pool.stats(), 'tile': tile_pool.stats()}
+    uploads = upload_store.stats()
+    return [
+        ('heatwatch_cache_hits_total', 'counter', 'Cache hits by cache',
+         [({'cache': name}, stats['hits']) for name, stats in caches.items()]),
+        ('heatwatch_cache_misses_total', 'counter', 'Cache misses by cache',
+         [({'cache': name}, stats['misses']) for name, stats in caches.items()]),
+        ('heatwatch_cache_entries', 'gauge', 'Entries held in memory by cache',
+         [({'cache': name}, stats.get('size', stats.get('memory', {}).get('size', 0))) for name, stats in caches.items()]),
+        ('heatwatch_heat_lookup_cache_bytes', 'gauge', 'Approximate memory held by the heat lookup cache',
+         [({}, heat_lookup.get('approx_bytes', 0))]),
+        ('heatwatch_analysis_pool_jobs', 'gauge', 'Worker pool jobs by pool and state',
+         [({'pool': name, 'state': state}, stats[state]) for name, stats in pools.items() for state in ('running', 'queued')]),
+        ('heatwatch_analysis_pool_rejected_total', 'counter', 'Worker pool jobs rejected with 503, by pool',
+         [({'pool': name}, stats['rejected']) for name, stats in pools.items()]),
+        ('heatwatch_analysis_pool_timeouts_total', 'counter', 'Worker pool jobs cancelled after their caller timed out',
+         [({'pool': name}, stats['timed_out']) for name, stats in pools.items()]),
+        ('heatwatch_upload_store_bytes', 'gauge', 'Bytes in the upload store as of the last sweep',
+         [({}, uploads['bytes'] or 0)]),
+        ('heatwatch_upload_evictions_total', 'counter', 'Uploads removed by the eviction sweeper',
+         [({}, uploads['evicted_files'])])
+    ]
+
+REGISTRY.add_collector(cache_metrics)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if profiler is not None:
+        g.profile_trace = profiler.start()
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    
+    if REGISTRY.enabled:
+        REGISTRY.inc('heatwatch_http_requests_total', route=route, method=request.method, status=response.status_code)
+        REGISTRY.observe('heatwatch_http_request_seconds', time.perf_counter() - g.request_start, route=route)
+        REGISTRY.inc('heatwatch_http_request_bytes_total', request.content_length or 0, route=route)
+        if not response.is_streamed:
+            REGISTRY.inc('heatwatch_http_response_bytes_total', response.content_length or 0, route=route)
+    
+    if profiler is not None and 'profile_trace' in g:
+        profiler.stop(g.pop('profile_trace'), f'{request.method} {request.path}')
+    
+    return response
+
+@app.after_request
+def compress_json(response):
+    # Registered after the metrics hook so it runs first and byte counters see wire sizes
+    return compress_response(response, request.headers.get('Accept-Encoding'))
+
+def wants_compact_grid():
+    """Compact heatmap grids via ?format=compact or an Accept of the grid media type"""
+    return request.args.get('format') == 'compact' or GRID_MEDIA_TYPE in request.headers.get('Accept', '')
+
+def get_batch_executor():
+    """Lazily start the shared batch analysis process pool"""
+    global batch_executor
+    if batch_executor is None:
+        batch_executor = ProcessPoolExecutor(max_workers=BATCH_WORKERS)
+    return batch_executor
+
 @app.route('/')
 def index():
     """Serve the main dashboard page"""
@@ -50,16 +221,24 @@ def upload_file():
         if not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file type. Please upload an image.'}), 400
         
-        # Save file
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
         
-        # Analyze the building image
-        analysis_result = building_analyzer.analyze_image(filepath)
+        # One read: hashed while written to the content store, kept in memory for analysis
+        with stage('upload.store'):
+            upload = upload_store.ingest(file.stream)
+        
+        # Identical uploads skip the decode entirely
+        analysis_result = analysis_cache.get(upload.digest)
+        cached = analysis_result is not None
         
-        if not analysis_result['success']:
-            return jsonify({'error': 'Failed to analyze image'}), 500
+        if not cached:
+            # Analyze the in-memory copy on the bounded analysis pool, no re-read from disk
+            analysis_result = analysis_pool.run(building_analyzer.analyze_image, upload.buffer)
+            
+            if not analysis_result['success']:
+                return jsonify({'error': 'Failed to analyze image'}), 500
+            
+            analysis_cache.put(upload.digest, analysis_result)
         
         # Store analysis in session
         session['building_analysis'] = analysis_result['building_features']
@@ -68,13 +247,262 @@ def upload_file():
         return jsonify({
             'success': True,
             'filename': filename,
+            'upload_id': upload.digest,
             'analysis': analysis_result['image_info'],
+            'cached': cached,
             'message': 'File uploaded and analyzed successfully'
         })
     
+    except ServerBusy as e:
+        return busy_response(e)
+    except RequestEntityTooLarge as e:
+        return handle_too_large(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/upload-batch', methods=['POST'])
+def upload_batch():
+    """
+    Analyze many building images in one request
+    Streams one NDJSON line per file as results complete; cached uploads are
+    answered immediately and the rest fan out across the batch process pool.
+    """
+    # Raised for this route only; must be set before the form is parsed
+    request.max_content_length = BATCH_MAX_BYTES
+    request.max_form_parts = BATCH_MAX_FILES + 16
+    files = request.files.getlist('building_images')
+    
+    if not files:
+        return jsonify({'error': 'No files uploaded'}), 400
+    
+    cached_rows = []
+    pending = {}  # stored path -> [(filename, digest), ...], identical files analyzed once
+    
+    for file in files:
+        filename = secure_filename(file.filename or '')
+        
+        if not filename or not allowed_file(filename):
+            cached_rows.append({'filename': file.filename, 'cached': False, 'success': False, 'error': 'Invalid file type'})
+            continue
+        
+        # Pool workers read the stored file, so no in-memory copy is kept
+        try:
+            upload = upload_store.ingest(file.stream, in_memory=False)
+        except OSError:
+            cached_rows.append({'filename': filename, 'cached': False, 'success': False, 'error': 'Failed to store image'})
+            continue
+        analysis_result = analysis_cache.get(upload.digest)
+        
+        if analysis_result is not None:
+            cached_rows.append({'filename': filename, 'cached': True, **analysis_result})
+            continue
+        
+        pending.setdefault(upload.path, []).append((filename, upload.digest))
+    
+    def generate():
+        for row in cached_rows:
+            yield json.dumps(row) + '\n'
+        
+        results = building_analyzer.analyze_many(
+            list(pending), BATCH_WORKERS, BATCH_CHUNKSIZE,
+            executor=get_batch_executor() if BATCH_WORKERS > 1 else None
+        )
+        
+        for result in results:
+            uploads = pending[result.pop('path')]
+            if result['success']:
+                analysis_cache.put(uploads[0][1], result)
+            else:
+                result['error'] = 'Failed to analyze image'  # Decoder messages name server paths
+            for filename, _ in uploads:
+                yield json.dumps({'filename': filename, 'cached': False, **result}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def finite_float(value, name):
+    """value as a finite float; ValueError (a 400) for anything else, including NaN and inf"""
+    if isinstance(value, bool):
+        raise ValueError(f'{name} must be a number')
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number')
+    if not math.isfinite(number):
+        raise ValueError(f'{name} must be finite')
+    return number
+
+def parse_features(features, name='building_features'):
+    """
+    Check one site's features dict
+    Factors must be finite numbers; other values (analyzer labels such as
+    heat_absorption) must be plain scalars, since rules compare them directly.
+    """
+    if features is None:
+        return None
+    if not isinstance(features, dict):
+        raise ValueError(f'{name} must be an object')
+    
+    for key, value in features.items():
+        if key in FEATURE_FACTORS:
+            features[key] = finite_float(value, f'{name}.{key}')
+        elif value is not None and not isinstance(value, (str, int, float, bool)):
+            raise ValueError(f'{name}.{key} must be a string or number')
+    return features
+
+def parse_sites():
+    """
+    Read bulk site input from JSON or CSV
+    JSON: {"latitudes": [...], "longitudes": [...], "building_features": {...} or
+    [{...}, ...], "detail": [row indices]}
+    CSV (text/csv body or a 'sites' file field): lat/latitude and lng/longitude
+    columns, plus optional size_factor, absorption_factor, design_factor columns.
+    Returns (lats, lngs, building_features, detail_indices).
+    """
+    csv_file = request.files.get('sites')
+    
+    if csv_file is None and request.mimetype != 'text/csv':
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or 'latitudes' not in data or 'longitudes' not in data:
+            raise ValueError('latitudes and longitudes required')
+        for key in ('latitudes', 'longitudes', 'detail'):
+            if not isinstance(data.get(key, []), list):
+                raise ValueError(f'{key} must be an array')
+        
+        lats = [finite_float(value, 'latitudes') for value in data['latitudes']]
+        lngs = [finite_float(value, 'longitudes') for value in data['longitudes']]
+        features = data.get('building_features')
+        if isinstance(features, list):
+            features = [parse_features(site, 'building_features[]') for site in features]
+        else:
+            features = parse_features(features)
+        detail = [int(finite_float(index, 'detail')) for index in data.get('detail', [])]
+    else:
+        text = csv_file.read().decode('utf-8-sig') if csv_file else request.get_data(as_text=True)
+        reader = csv.DictReader(io.StringIO(text))
+        lat_key = 'lat' if 'lat' in (reader.fieldnames or []) else 'latitude'
+        lng_key = 'lng' if 'lng' in (reader.fieldnames or []) else 'longitude'
+        factor_keys = [name for name in FEATURE_FACTORS if name in (reader.fieldnames or [])]
+        
+        lats, lngs, features = [], [], []
+        for row in reader:
+            lats.append(finite_float(row[lat_key], lat_key))
+            lngs.append(finite_float(row[lng_key], lng_key))
+            features.append({name: finite_float(row[name], name) for name in factor_keys if row[name]})
+        
+        features = features if factor_keys else None
+        detail = [int(index) for index in request.args.get('detail', '').split(',') if index]
+    
+    if len(lats) != len(lngs):
+        raise ValueError('latitudes and longitudes must have the same length')
+    if isinstance(features, list) and len(features) != len(lats):
+        raise ValueError('building_features list must have one entry per site')
+    if len(detail) > MAX_SCORE_DETAILS:
+        raise ValueError(f'At most {MAX_SCORE_DETAILS} detail rows per request')
+    
+    return lats, lngs, features, detail
+
+@app.route('/api/score-sites', methods=['POST'])
+def score_sites():
+    """
+    Bulk site scoring over many coordinates
+    Streams NDJSON: a header line naming the row columns and code tables, one
+    compact [suitability_score, verdict_code, risk_level] row per site in input
+    order, then a full recommendations line for each index listed in 'detail'.
+    """
+    try:
+        lats, lngs, features, detail = parse_sites()
+    except (ValueError, KeyError, UnicodeDecodeError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def score_chunk(start):
+        stop = start + SCORE_CHUNK_SIZE
+        heat_index = heat_processor.query_many(lats[start:stop], lngs[start:stop])['heat_index']
+        chunk_features = features[start:stop] if isinstance(features, list) else features
+        scores = recommendation_engine.score_many(heat_index, chunk_features)
+        risk_codes = heat_processor.risk_level_codes(heat_index)
+        
+        return ''.join(
+            json.dumps([score, verdict, RISK_LEVELS[risk]]) + '\n'
+            for score, verdict, risk in zip(
+                scores['suitability_score'].tolist(),
+                scores['verdict_code'].tolist(),
+                risk_codes.tolist()
+            )
+        )
+    
+    # Score the first chunk up front so a saturated server answers 503 before streaming starts
+    first_rows = analysis_pool.run(score_chunk, 0) if len(lats) else ''
+    
+    def generate():
+        yield json.dumps({
+            'count': len(lats),
+            'columns': ['suitability_score', 'verdict_code', 'risk_level'],
+            'verdicts': VERDICTS
+        }) + '\n'
+        yield first_rows
+        
+        for start in range(SCORE_CHUNK_SIZE, len(lats), SCORE_CHUNK_SIZE):
+            try:
+                yield analysis_pool.run(score_chunk, start)
+            except ServerBusy as e:
+                yield json.dumps({'error': str(e), 'offset': start}) + '\n'
+                return
+        
+        # Full recommendation text only for the rows the client asked for
+        for index in detail:
+            if not 0 <= index < len(lats):
+                continue
+            heat_data = heat_processor.get_heat_data(lats[index], lngs[index])
+            site_features = features[index] if isinstance(features, list) else features
+            yield json.dumps({
+                'index': index,
+                'heat_data': heat_data,
+                'recommendations': recommendation_engine.generate_recommendations(heat_data, site_features)
+            }) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def current_heat_raster():
+    """The heat raster pyramid, reopened once heat_raster.py has rebuilt it; None if there is none"""
+    global heat_raster
+    raster = heat_raster
+    if raster is not None and raster.changed():
+        try:
+            raster = heat_raster = HeatRasterPyramid(HEAT_RASTER_PATH)
+        except (OSError, ValueError, KeyError):
+            pass  # Keep serving the pyramid already open
+    return raster
+
+def analyze_coordinates(lat, lng, building_features=None, at=None):
+    """Heat data, recommendations and heatmap grid for one location, optionally at a past hour"""
+    # Get heat data for location
+    with stage('location.heat_data'):
+        heat_data = heat_processor.get_heat_data(lat, lng, at=at)
+    
+    # Generate recommendations
+    with stage('location.recommendations'):
+        recommendations = recommendation_engine.generate_recommendations(
+            heat_data, building_features
+        )
+    
+    # Generate heatmap grid arrays, sliced from the precomputed raster when it covers the area
+    with stage('location.grid'):
+        # The raster holds the zone baseline of the dataset it was built from, so timed lookups
+        # and a raster left behind by a dataset reload always go to the processor
+        raster = current_heat_raster()
+        heatmap_grid = None
+        if raster is not None and at is None and raster.data_version == heat_processor.data_version:
+            heatmap_grid = raster.heatmap_grid(lat, lng, as_array=True)
+        if heatmap_grid is None:
+            heatmap_grid = heat_processor.generate_heatmap_grid(lat, lng, as_array=True, at=at)
+    
+    return {
+        'success': True,
+        'heat_data': heat_data,
+        'recommendations': recommendations,
+        'heatmap_data': heatmap_grid
+    }
+
 @app.route('/api/analyze-location', methods=['POST'])
 def analyze_location():
     """Analyze location based on coordinates"""
@@ -84,47 +512,242 @@ def analyze_location():
         if not data or 'latitude' not in data or 'longitude' not in data:
             return jsonify({'error': 'Latitude and longitude required'}), 400
         
-        lat = float(data['latitude'])
-        lng = float(data['longitude'])
+        try:
+            lat = finite_float(data['latitude'], 'latitude')
+            lng = finite_float(data['longitude'], 'longitude')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        # Get heat data for location
-        heat_data = heat_processor.get_heat_data(lat, lng)
+        # Optional time: use that hour's readings from the heat time series
+        at = None
+        if data.get('time') is not None:
+            if heat_processor.timeseries is None:
+                return jsonify({'error': 'No heat time series available'}), 404
+            try:
+                at = parse_time(data['time'])
+            except ValueError:
+                return jsonify({'error': 'time must be epoch seconds or ISO 8601'}), 400
         
         # Get building features from session
         building_features = session.get('building_analysis', None)
         
-        # Generate recommendations
-        recommendations = recommendation_engine.generate_recommendations(
-            heat_data, building_features
-        )
-        
-        # Generate heatmap grid data
-        heatmap_grid = heat_processor.generate_heatmap_grid(lat, lng)
-        
-        result = {
-            'success': True,
-            'heat_data': heat_data,
-            'recommendations': recommendations,
-            'heatmap_data': heatmap_grid
-        }
+        # Run the CPU-heavy part on the bounded analysis pool
+        result = analysis_pool.run(analyze_coordinates, lat, lng, building_features, at)
         
-        # Store in session for results page
-        session['analysis_result'] = result
+        # Keep the result server-side, with the compact grid; the session cookie only carries its ID
+        with stage('location.serialize'):
+            grid = result['heatmap_data']
+            result['heatmap_data'] = encode_compact(grid)
+            payload = app.json.dumps(result)
+            session.pop('analysis_result', None)
+            session['result_id'] = result_store.put(payload)
+            
+            if not wants_compact_grid():
+                result['heatmap_data'] = grid_points(grid)
+                payload = app.json.dumps(result)
         
-        return jsonify(result)
+        response = Response(payload, mimetype='application/json')
+        response.vary.add('Accept')
+        return response
+    
+    except ServerBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/heat-raster', methods=['GET'])
+def get_heat_raster():
+    """Return the precomputed heat raster window for a bounding box"""
+    raster = current_heat_raster()
+    if raster is None:
+        return jsonify({'error': 'No heat raster available'}), 404
+    
+    try:
+        lat_min, lat_max, lng_min, lng_max = (
+            finite_float(request.args[name], name) for name in ('lat_min', 'lat_max', 'lng_min', 'lng_max')
+        )
+        max_cells = min(int(request.args.get('max_cells', MAX_RASTER_CELLS)), MAX_RASTER_CELLS)
+    except KeyError:
+        return jsonify({'error': 'lat_min, lat_max, lng_min and lng_max required'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    window = raster.window(lat_min, lat_max, lng_min, lng_max, max_cells=max_cells)
+    
+    if window is None:
+        return jsonify({'error': 'Bounding box outside raster coverage'}), 404
+    
+    intensity = window.pop('intensity')
+    window['shape'] = list(intensity.shape)
+    window['intensity'] = intensity.tolist()
+    
+    # stale: the raster was built from a different dataset than the one now loaded
+    return jsonify({'success': True, 'stale': raster.data_version != heat_processor.data_version, **window})
+
+@app.route('/api/heat-timeseries', methods=['GET'])
+def get_heat_timeseries():
+    """Temperature aggregates (and optionally the hourly series) at a coordinate over a time window"""
+    if heat_processor.timeseries is None:
+        return jsonify({'error': 'No heat time series available'}), 404
+    
+    try:
+        lat = finite_float(request.args['lat'], 'lat')
+        lng = finite_float(request.args['lng'], 'lng')
+        start = parse_time(request.args['start'])
+        end = parse_time(request.args['end'])
+        threshold = finite_float(request.args.get('threshold', 35.0), 'threshold')
+    except (KeyError, ValueError):
+        return jsonify({'error': 'lat, lng, start and end required; times as epoch seconds or ISO 8601, '
+                                 'threshold a finite number'}), 400
+    
+    include_series = request.args.get('series') == '1'
+    if end <= start:
+        return jsonify({'error': 'end must be after start'}), 400
+    if include_series and end - start > MAX_SERIES_HOURS * 3600:
+        return jsonify({'error': f'Hourly series limited to {MAX_SERIES_HOURS} hours'}), 400
+    
+    try:
+        result = heat_processor.heat_exposure(lat, lng, start, end, threshold, series=include_series)
+        return jsonify({'success': True, **result})
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/suitability', methods=['GET'])
+def get_suitability():
+    """Precomputed heat index and per-profile suitability scores for the cell holding a point"""
+    if suitability_index is None:
+        return jsonify({'error': 'No suitability index available'}), 404
+    
+    try:
+        lat = finite_float(request.args['lat'], 'lat')
+        lng = finite_float(request.args['lng'], 'lng')
+    except KeyError:
+        return jsonify({'error': 'lat and lng required'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    cell = suitability_index.point(lat, lng)
+    if cell is None:
+        return jsonify({'error': 'Point outside suitability index coverage'}), 404
+    
+    # stale: the index was built from a different dataset than the one now loaded
+    return jsonify({'success': True, 'stale': suitability_index.data_version != heat_processor.data_version, **cell})
+
+@app.route('/api/suitability/top', methods=['GET'])
+def get_top_suitability():
+    """The n most suitable precomputed cells in a bounding box for one building profile"""
+    if suitability_index is None:
+        return jsonify({'error': 'No suitability index available'}), 404
+    
+    try:
+        lat_min, lat_max, lng_min, lng_max = (
+            finite_float(request.args[name], name) for name in ('lat_min', 'lat_max', 'lng_min', 'lng_max')
+        )
+        n = min(int(request.args.get('n', 10)), MAX_TOP_CELLS)
+    except KeyError:
+        return jsonify({'error': 'lat_min, lat_max, lng_min and lng_max required'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if n < 1:
+        return jsonify({'error': 'n must be at least 1'}), 400
+    
+    profile = request.args.get('profile', 'default')
+    if profile not in suitability_index.profiles:
+        return jsonify({'error': f"Unknown profile. Choose from: {', '.join(suitability_index.profiles)}"}), 400
+    
+    cells = suitability_index.top(lat_min, lat_max, lng_min, lng_max, n, profile)
+    if cells is None:
+        return jsonify({'error': 'Bounding box outside suitability index coverage'}), 404
+    
+    return jsonify({
+        'success': True,
+        'profile': profile,
+        'stale': suitability_index.data_version != heat_processor.data_version,
+        'cells': cells
+    })
+
+@app.route('/api/heat-tiles/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+def get_heat_tile(z, x, y):
+    """Serve a 256x256 heat intensity tile for the Leaflet overlay"""
+    if not valid_tile(z, x, y):
+        return jsonify({'error': 'Invalid tile coordinates'}), 404
+    
+    etag = heat_tiles.etag(z, x, y)
+    headers = {
+        'ETag': etag,
+        'Cache-Control': f'public, max-age={TILE_MAX_AGE}'
+    }
+    
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers=headers)
+    
+    # Cached tiles are a dict or file read; only renders take a slot, on a pool of their own
+    # so a map's burst of tile requests never competes with (or gets 503s from) analysis work
+    png = heat_tiles.cached_tile(z, x, y) or tile_pool.run(heat_tiles.render_tile, z, x, y)
+    return Response(png, mimetype='image/png', headers=headers)
+
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Report hit/miss counters for the server-side caches"""
+    return jsonify({
+        'analysis': analysis_cache.stats(),
+        'heat_lookup': heat_processor.cache_stats(),
+        'heat_tiles': heat_tiles.stats(),
+        'results': result_store.stats(),
+        'dataset': dataset_watcher.status(),
+        'uploads': upload_store.stats(),
+        'analysis_pool': analysis_pool.stats(),
+        'tile_pool': tile_pool.stats()
+    })
+
+@app.route('/api/admin/reload-data', methods=['GET', 'POST'])
+def reload_data():
+    """
+    Dataset reload status (GET) or trigger a background reload (POST)
+    Requires the X-Admin-Token header to match ADMIN_TOKEN. The reload builds
+    a new snapshot off the request path; poll GET for 'generation' to change.
+    Only this worker reloads - other workers pick the change up by polling
+    the file's mtime.
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin API is disabled'}), 404
+    
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({'error': 'Invalid admin token'}), 403
+    
+    if request.method == 'POST':
+        dataset_watcher.request_reload()
+        return jsonify({'success': True, 'message': 'Reload scheduled', **dataset_watcher.status()}), 202
+    
+    return jsonify(dataset_watcher.status())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text exposition of request, stage and cache metrics"""
+    if not REGISTRY.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/get-results', methods=['GET'])
 def get_results():
     """Retrieve stored analysis results"""
-    result = session.get('analysis_result', None)
+    payload = result_store.get(session.get('result_id'))
     
-    if not result:
+    if not payload:
         return jsonify({'error': 'No analysis data found'}), 404
     
-    return jsonify(result)
+    if not wants_compact_grid():
+        # Expand for clients that expect the point list (intensities at the stored 1/255 resolution)
+        result = json.loads(payload)
+        if is_compact(result.get('heatmap_data')):
+            result['heatmap_data'] = grid_points(decode_compact(result['heatmap_data']))
+            payload = app.json.dumps(result)
+    
+    response = Response(payload, mimetype='application/json')
+    response.vary.add('Accept')
+    return response
 
 @app.route('/static/<path:path>')
 def send_static(path):
@@ -132,8 +755,7 @@ def send_static(path):
     return send_from_directory('static', path)
 
 if __name__ == '__main__':
-    # Create necessary directories
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+    # Create necessary directories (the upload store creates its own)
     os.makedirs('static', exist_ok=True)
     
     print("=" * 60)
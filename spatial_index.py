@@ -0,0 +1,50 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371  # Mean Earth radius, as used by the haversine distances this index replaced
+
+def to_unit_vectors(lats, lngs):
+    """Project lat/lng degrees onto 3D points on the unit sphere"""
+    lat_rad = np.radians(np.asarray(lats, dtype=np.float64).ravel())
+    lng_rad = np.radians(np.asarray(lngs, dtype=np.float64).ravel())
+    cos_lat = np.cos(lat_rad)
+    
+    return np.column_stack((
+        cos_lat * np.cos(lng_rad),
+        cos_lat * np.sin(lng_rad),
+        np.sin(lat_rad)
+    ))
+
+def chord_to_km(chord):
+    """Convert straight-line unit-sphere distance into great-circle kilometres"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+class SpatialIndex:
+    """
+    KD-tree over sample locations on the unit sphere
+    Chord length grows monotonically with great-circle distance, so Euclidean
+    nearest neighbours in 3D are exactly the Haversine nearest neighbours,
+    without the seam problems of indexing raw lat/lng.
+    """
+    
+    def __init__(self, lats, lngs):
+        self.size = len(np.ravel(lats))
+        self._tree = cKDTree(to_unit_vectors(lats, lngs)) if self.size else None
+    
+    def __len__(self):
+        return self.size
+    
+    def query(self, lats, lngs, k=1):
+        """
+        Find the k nearest sample points for each coordinate
+        Returns (distances_km, indices) shaped (n,) for k=1 or (n, k) otherwise.
+        k is capped at the number of indexed points.
+        """
+        if self._tree is None:
+            raise ValueError('Spatial index is empty')
+        
+        chord, indices = self._tree.query(to_unit_vectors(lats, lngs), k=min(k, self.size))
+        if k > 1 and chord.ndim == 1:
+            chord, indices = chord[:, None], indices[:, None]
+        
+        return chord_to_km(chord), indices
@@ -0,0 +1,329 @@
+"""
+Precomputed construction suitability index for a region
+
+Score every cell of a bounding box offline, across worker processes:
+    python suitability_index.py --bbox 18.85 19.30 72.75 73.05 --resolution 0.0005 --out data/suitability_index
+
+Each cell gets its interpolated heat index and a suitability score for every
+building profile in PROFILES, computed exactly as /api/score-sites does. The
+box is cut into TILE_SIZE x TILE_SIZE tiles; finished tiles are logged to
+progress.log, so an interrupted build picks up where it stopped when rerun
+with the same arguments (--restart discards it instead).
+
+The output is a directory of .npy arrays the server memory-maps read-only:
+heat.npy (uint8, heat index * 255), scores_<profile>.npy (uint16, score * 10)
+and blockmax_<profile>.npy, the best score in each tile, which lets top-N
+queries skip every tile that cannot beat the results found so far.
+index.json is written last and marks a finished index. Row 0 is the southern
+edge of the box and column 0 the western edge, as in heat_raster.py.
+"""
+import argparse
+import json
+import math
+import os
+import heapq
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+
+METADATA_FILE = 'index.json'
+BUILD_FILE = 'build.json'
+PROGRESS_FILE = 'progress.log'
+INDEX_FORMAT = 1
+
+TILE_SIZE = 128  # Cells per tile side, the unit of work, checkpointing and top-N pruning
+SCORE_SCALE = 10  # Scores are rounded to 0.1, so score * 10 is stored exactly
+HEAT_SCALE = 255
+
+# Building profiles scored for every cell, as building_features dicts for RecommendationEngine
+PROFILES = {
+    'default': {},
+    'cool_roof': {'absorption_factor': 0.7},
+    'dark_roof': {'absorption_factor': 1.4},
+    'large_advanced': {'size_factor': 1.3, 'design_factor': 0.8}
+}
+
+def _heat_file():
+    return 'heat.npy'
+
+def _score_file(profile):
+    return f'scores_{profile}.npy'
+
+def _blockmax_file(profile):
+    return f'blockmax_{profile}.npy'
+
+_worker = None
+
+def _init_worker(data_file, interpolation, rules_file):
+    """Pool initializer: one processor (and KD-tree) and engine per worker process"""
+    global _worker
+    from heat_data import HeatDataProcessor
+    from recommendations import RecommendationEngine
+    _worker = (HeatDataProcessor(data_file, interpolation=interpolation, cache_size=0),
+               RecommendationEngine(rules_file))
+
+def _score_tile(tile, grid):
+    """Worker entry point: heat and per-profile scores for one tile"""
+    processor, engine = _worker
+    tile_row, tile_col = tile
+    r0, c0 = tile_row * TILE_SIZE, tile_col * TILE_SIZE
+    r1, c1 = min(r0 + TILE_SIZE, grid['rows']), min(c0 + TILE_SIZE, grid['cols'])
+    
+    lats = grid['lat_min'] + (np.arange(r0, r1) + 0.5) * grid['resolution']
+    lngs = grid['lng_min'] + (np.arange(c0, c1) + 0.5) * grid['resolution']
+    lat_grid, lng_grid = np.meshgrid(lats, lngs, indexing='ij')
+    heat_index = processor.query_many(lat_grid, lng_grid)['heat_index'].reshape(r1 - r0, c1 - c0)
+    
+    scores = {
+        profile: np.rint(engine.score_many(heat_index, features)['suitability_score'] * SCORE_SCALE).astype(np.uint16)
+        for profile, features in grid['profiles'].items()
+    }
+    heat = np.clip(np.rint(heat_index * HEAT_SCALE), 0, HEAT_SCALE).astype(np.uint8)
+    return tile, heat, scores
+
+def build_index(bbox, out_dir, resolution=0.001, data_file='data/sample_heat_data.json', interpolation='idw',
+                rules_file='data/recommendation_rules.json', profiles=None, workers=None, restart=False,
+                verbose=False):
+    """
+    Score every cell of bbox (lat_min, lat_max, lng_min, lng_max) into out_dir
+    Resumes a matching unfinished build unless restart; raises ValueError if
+    out_dir holds a build with different arguments. Returns the metadata.
+    """
+    lat_min, lat_max, lng_min, lng_max = bbox
+    if lat_max <= lat_min or lng_max <= lng_min:
+        raise ValueError('Bounding box must be (lat_min, lat_max, lng_min, lng_max) with min < max')
+    
+    from heat_dataset import HeatDataset
+    profiles = profiles or PROFILES
+    grid = {
+        'lat_min': lat_min,
+        'lng_min': lng_min,
+        'resolution': resolution,
+        'rows': math.ceil((lat_max - lat_min) / resolution),
+        'cols': math.ceil((lng_max - lng_min) / resolution),
+        'profiles': profiles
+    }
+    build = {
+        'bbox': [lat_min, lat_max, lng_min, lng_max],
+        'resolution': resolution,
+        'interpolation': interpolation,
+        'profiles': profiles,
+        'data_version': HeatDataset.open(data_file).version,
+        'tile_size': TILE_SIZE
+    }
+    
+    os.makedirs(out_dir, exist_ok=True)
+    build_path = os.path.join(out_dir, BUILD_FILE)
+    progress_path = os.path.join(out_dir, PROGRESS_FILE)
+    shape = (grid['rows'], grid['cols'])
+    done = set()
+    
+    if os.path.isfile(build_path) and not restart:
+        with open(build_path, 'r') as f:
+            previous = json.load(f)
+        if previous != build:
+            raise ValueError(f'{out_dir} holds a build with different arguments or data; use --restart')
+        if os.path.isfile(progress_path):
+            with open(progress_path, 'r') as f:
+                done = {tuple(map(int, line.split())) for line in f if line.strip()}
+    
+    if not done:
+        for name in os.listdir(out_dir):
+            if name.endswith('.npy') or name in (METADATA_FILE, PROGRESS_FILE):
+                os.remove(os.path.join(out_dir, name))
+        arrays = {'heat': np.lib.format.open_memmap(
+            os.path.join(out_dir, _heat_file()), mode='w+', dtype=np.uint8, shape=shape)}
+        for profile in profiles:
+            arrays[profile] = np.lib.format.open_memmap(
+                os.path.join(out_dir, _score_file(profile)), mode='w+', dtype=np.uint16, shape=shape)
+        with open(build_path, 'w') as f:
+            json.dump(build, f, indent=2)
+    else:
+        arrays = {'heat': np.load(os.path.join(out_dir, _heat_file()), mmap_mode='r+')}
+        for profile in profiles:
+            arrays[profile] = np.load(os.path.join(out_dir, _score_file(profile)), mmap_mode='r+')
+    
+    tiles = [
+        (tile_row, tile_col)
+        for tile_row in range(math.ceil(grid['rows'] / TILE_SIZE))
+        for tile_col in range(math.ceil(grid['cols'] / TILE_SIZE))
+        if (tile_row, tile_col) not in done
+    ]
+    total = len(tiles) + len(done)
+    
+    with open(progress_path, 'a') as progress, ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(data_file, interpolation, rules_file)) as pool:
+        max_in_flight = 2 * (workers or os.cpu_count() or 1)
+        pending = set()
+        remaining = iter(tiles)
+        
+        while True:
+            for tile in remaining:
+                pending.add(pool.submit(_score_tile, tile, grid))
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+            
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                (tile_row, tile_col), heat, scores = future.result()
+                rows = slice(tile_row * TILE_SIZE, tile_row * TILE_SIZE + heat.shape[0])
+                cols = slice(tile_col * TILE_SIZE, tile_col * TILE_SIZE + heat.shape[1])
+                arrays['heat'][rows, cols] = heat
+                for profile, values in scores.items():
+                    arrays[profile][rows, cols] = values
+                
+                # Data reaches disk before the tile is logged, so a crash only ever redoes work
+                for array in arrays.values():
+                    array.flush()
+                progress.write(f'{tile_row} {tile_col}\n')
+                progress.flush()
+                os.fsync(progress.fileno())
+                done.add((tile_row, tile_col))
+                
+                if verbose:
+                    print(f'tiles: {len(done)}/{total}')
+    
+    for profile in profiles:
+        np.save(os.path.join(out_dir, _blockmax_file(profile)), _block_max(arrays[profile]))
+    
+    metadata = dict(build, format=INDEX_FORMAT, shape=list(shape), score_scale=SCORE_SCALE, heat_scale=HEAT_SCALE)
+    with open(os.path.join(out_dir, METADATA_FILE), 'w') as f:
+        json.dump(metadata, f, indent=2)
+    os.remove(progress_path)
+    
+    return metadata
+
+def _block_max(scores):
+    """Best score per TILE_SIZE x TILE_SIZE block, read one band of tiles at a time"""
+    rows, cols = scores.shape
+    block_cols = math.ceil(cols / TILE_SIZE)
+    out = np.zeros((math.ceil(rows / TILE_SIZE), block_cols), dtype=np.uint16)
+    
+    for block_row in range(out.shape[0]):
+        band = np.asarray(scores[block_row * TILE_SIZE:(block_row + 1) * TILE_SIZE])
+        padded = np.pad(band, ((0, 0), (0, block_cols * TILE_SIZE - cols)))
+        out[block_row] = padded.reshape(band.shape[0], block_cols, TILE_SIZE).max(axis=(0, 2))
+    
+    return out
+
+class SuitabilityIndex:
+    """Read-only, memory-mapped view over an index written by build_index"""
+    
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, METADATA_FILE), 'r') as f:
+            self.metadata = json.load(f)
+        if self.metadata.get('format') != INDEX_FORMAT:
+            raise ValueError(f"Unsupported suitability index format {self.metadata.get('format')} in {path}")
+        
+        self.lat_min, self.lat_max, self.lng_min, self.lng_max = self.metadata['bbox']
+        self.resolution = self.metadata['resolution']
+        self.rows, self.cols = self.metadata['shape']
+        self.profiles = list(self.metadata['profiles'])
+        self.data_version = self.metadata['data_version']
+        self.heat = np.load(os.path.join(path, _heat_file()), mmap_mode='r')
+        self.scores = {p: np.load(os.path.join(path, _score_file(p)), mmap_mode='r') for p in self.profiles}
+        self.block_max = {p: np.load(os.path.join(path, _blockmax_file(p))) for p in self.profiles}
+    
+    @classmethod
+    def exists(cls, path):
+        return os.path.isfile(os.path.join(path, METADATA_FILE))
+    
+    def _cell_dict(self, row, col):
+        return {
+            'lat': round(self.lat_min + (row + 0.5) * self.resolution, 7),
+            'lng': round(self.lng_min + (col + 0.5) * self.resolution, 7),
+            'heat_index': round(int(self.heat[row, col]) / HEAT_SCALE, 3)
+        }
+    
+    def point(self, lat, lng):
+        """Heat index and every profile's score for the cell holding (lat, lng), None outside"""
+        if not (math.isfinite(lat) and math.isfinite(lng)):
+            return None
+        
+        row = math.floor((lat - self.lat_min) / self.resolution)
+        col = math.floor((lng - self.lng_min) / self.resolution)
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            return None
+        
+        result = self._cell_dict(row, col)
+        result['scores'] = {p: int(self.scores[p][row, col]) / SCORE_SCALE for p in self.profiles}
+        return result
+    
+    def top(self, lat_min, lat_max, lng_min, lng_max, n=10, profile='default'):
+        """
+        The n best-scoring cells intersecting a bounding box, best first
+        Tiles are visited in order of their best score and skipped once they
+        cannot beat the n-th result, so large boxes read only a few tiles.
+        Equal scores favour southern, then western cells within the tiles
+        visited. Returns None if the box is outside the index.
+        """
+        if profile not in self.scores:
+            raise ValueError(f"Unknown profile '{profile}'. Choose from: {', '.join(self.profiles)}")
+        if not all(math.isfinite(value) for value in (lat_min, lat_max, lng_min, lng_max)):
+            raise ValueError('Bounding box coordinates must be finite')
+        
+        r0 = max(0, math.floor((lat_min - self.lat_min) / self.resolution))
+        c0 = max(0, math.floor((lng_min - self.lng_min) / self.resolution))
+        r1 = min(self.rows, math.ceil((lat_max - self.lat_min) / self.resolution))
+        c1 = min(self.cols, math.ceil((lng_max - self.lng_min) / self.resolution))
+        if r1 <= r0 or c1 <= c0 or n <= 0:
+            return None
+        
+        scores, block_max = self.scores[profile], self.block_max[profile]
+        br0, br1 = r0 // TILE_SIZE, (r1 - 1) // TILE_SIZE + 1
+        bc0, bc1 = c0 // TILE_SIZE, (c1 - 1) // TILE_SIZE + 1
+        window = block_max[br0:br1, bc0:bc1]
+        order = np.argsort(-window, axis=None, kind='stable')
+        
+        best = []  # Min-heap of (score, -row, -col), the worst kept result on top
+        for flat in order.tolist():
+            block_row, block_col = divmod(flat, window.shape[1])
+            if len(best) == n and window[block_row, block_col] <= best[0][0]:
+                break
+            
+            block_top, block_left = (br0 + block_row) * TILE_SIZE, (bc0 + block_col) * TILE_SIZE
+            top_row, bottom = max(r0, block_top), min(r1, block_top + TILE_SIZE)
+            left, right = max(c0, block_left), min(c1, block_left + TILE_SIZE)
+            values = np.asarray(scores[top_row:bottom, left:right]).ravel()
+            
+            # Score, then lower position, in one int64 key so a partial sort picks exact winners
+            key = values.astype(np.int64) * len(values) - np.arange(len(values))
+            candidates = np.argpartition(-key, n - 1)[:n] if len(values) > n else np.arange(len(values))
+            for index in candidates.tolist():
+                row, col = divmod(index, right - left)
+                item = (int(values[index]), -(top_row + row), -(left + col))
+                if len(best) < n:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+        
+        results = []
+        for score, row, col in sorted(best, reverse=True):
+            cell = self._cell_dict(-row, -col)
+            cell['score'] = score / SCORE_SCALE
+            results.append(cell)
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bbox', type=float, nargs=4, required=True,
+                        metavar=('LAT_MIN', 'LAT_MAX', 'LNG_MIN', 'LNG_MAX'))
+    parser.add_argument('--resolution', type=float, default=0.001, help='Cell size in degrees')
+    parser.add_argument('--data-file', default='data/sample_heat_data.json')
+    parser.add_argument('--interpolation', default='idw')
+    parser.add_argument('--rules', default='data/recommendation_rules.json')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--restart', action='store_true', help='Discard an unfinished build instead of resuming')
+    parser.add_argument('--out', default='data/suitability_index')
+    args = parser.parse_args()
+    
+    metadata = build_index(args.bbox, args.out, args.resolution, args.data_file, args.interpolation,
+                           args.rules, workers=args.workers, restart=args.restart, verbose=True)
+    
+    rows, cols = metadata['shape']
+    print(f"Wrote {rows}x{cols} cells x {len(metadata['profiles'])} profiles to {args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+class ServerBusy(Exception):
+    """Raised when a pool's queue is full; callers should answer 503"""
+
+class BoundedExecutor:
+    """
+    Thread pool for CPU-heavy analysis with a hard cap on queued work
+    At most max_workers jobs run at once and at most max_queue more may wait;
+    anything beyond that is rejected immediately with ServerBusy instead of
+    piling up. NumPy and Pillow release the GIL in their heavy loops, so the
+    request threads serving cheap routes stay responsive meanwhile.
+    A caller that gives up after timeout cancels its job, so work nobody is
+    waiting for gives its slot back instead of running later.
+    """
+    
+    def __init__(self, max_workers=4, max_queue=8, timeout=None, name='analysis'):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.name = name
+        self.rejected = 0
+        self.timed_out = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+    
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise ServerBusy(f'{self.name.capitalize()} queue is full, retry shortly')
+        
+        with self._lock:
+            self._in_flight += 1
+        
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        
+        future.add_done_callback(self._release)
+        return future
+    
+    def _release(self, _):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+    
+    def run(self, fn, *args, **kwargs):
+        """Submit and wait for the result from a synchronous caller"""
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise self._abandon(future)
+    
+    def _abandon(self, future):
+        """
+        Cancel a job whose caller stopped waiting; returns the ServerBusy to raise
+        A queued job is dropped and its done callback frees the slot at once; a
+        job already running cannot be interrupted and frees it when it returns.
+        """
+        future.cancel()
+        self.timed_out += 1
+        return ServerBusy(f'{self.name.capitalize()} timed out waiting for a worker, retry shortly')
+    
+    def stats(self):
+        in_flight = self._in_flight
+        return {
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'running': min(in_flight, self.max_workers),
+            'queued': max(0, in_flight - self.max_workers),
+            'rejected': self.rejected,
+            'timed_out': self.timed_out
+        }
+    
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
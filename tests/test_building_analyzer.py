@@ -0,0 +1,40 @@
+import io
+import pytest
+from PIL import Image
+from building_analyzer import BuildingAnalyzer
+
+def _image(size, format, color=(200, 200, 200)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format=format)
+    buffer.seek(0)
+    return buffer
+
+def test_solid_image_statistics():
+    result = BuildingAnalyzer().analyze_image(_image((64, 48), 'PNG'))
+    info = result['image_info']
+    
+    assert result['success']
+    assert (info['width'], info['height']) == (64, 48)
+    assert info['average_brightness'] == round(200 / 255, 2)
+    assert info['complexity'] == 'simple' and info['dominant_colors'] == 'light_colors'
+
+@pytest.mark.parametrize('format', ['PNG', 'GIF', 'BMP'])
+def test_oversized_image_is_rejected_before_decoding(format, monkeypatch):
+    upload = _image((40, 30), format)
+    
+    def fail(*args, **kwargs):
+        raise AssertionError('pixel data was decoded')
+    monkeypatch.setattr(Image.Image, 'load', fail)
+    
+    result = BuildingAnalyzer(max_pixels=100, max_decode_pixels=1000).analyze_image(upload)
+    
+    assert not result['success']
+    assert 'too large' in result['error']
+
+def test_jpeg_limit_applies_after_draft_scaling():
+    # 1600x1200 (1.9M pixels) drafts to 400x300 for a 40000-pixel budget, inside the decode limit
+    analyzer = BuildingAnalyzer(max_pixels=40000, max_decode_pixels=200000)
+    result = analyzer.analyze_image(_image((1600, 1200), 'JPEG'))
+    
+    assert result['success']
+    assert result['image_info']['width'] == 1600
@@ -0,0 +1,41 @@
+import json
+import numpy as np
+from grid_codec import decode_compact, encode_compact, grid_points, is_compact
+from heat_data import HeatDataProcessor
+
+def _grid(rows=20, cols=20, seed=0):
+    return {
+        'lats': 19.0 + np.arange(rows) * 0.002,
+        'lngs': 72.8 + np.arange(cols) * 0.002,
+        'intensity': np.random.default_rng(seed).random((rows, cols))
+    }
+
+def test_round_trip_within_quantization():
+    grid = _grid()
+    payload = json.loads(json.dumps(encode_compact(grid)))
+    decoded = decode_compact(payload)
+    
+    assert is_compact(payload)
+    assert np.allclose(decoded['lats'], grid['lats'])
+    assert np.allclose(decoded['lngs'], grid['lngs'])
+    assert np.abs(decoded['intensity'] - grid['intensity']).max() <= 0.5 / 255 + 1e-12
+
+def test_round_trip_clips_and_keeps_shape():
+    grid = _grid(rows=1, cols=3)
+    grid['intensity'] = np.array([[-0.5, 0.5, 1.5]])
+    decoded = decode_compact(encode_compact(grid))
+    
+    assert decoded['intensity'].shape == (1, 3)
+    assert decoded['intensity'][0].tolist() == [0.0, 128 / 255, 1.0]
+    assert np.allclose(decoded['lngs'], grid['lngs'])
+
+def test_points_match_processor_grid():
+    processor = HeatDataProcessor(variation='none')
+    grid = processor.generate_heatmap_grid(19.076, 72.8777, as_array=True)
+    points = grid_points(decode_compact(encode_compact(grid)))
+    expected = grid_points(grid)
+    
+    assert len(points) == len(expected)
+    for point, reference in zip(points, expected):
+        assert abs(point['lat'] - reference['lat']) < 1e-9 and abs(point['lng'] - reference['lng']) < 1e-9
+        assert abs(point['intensity'] - reference['intensity']) <= 0.5 / 255 + 1e-12
@@ -0,0 +1,75 @@
+import json
+import os
+import stat
+import numpy as np
+import pytest
+from heat_data import HeatDataProcessor
+from heat_dataset import HeatDataset, METADATA_FILE
+
+SOURCE = 'data/sample_heat_data.json'
+
+def _write_source(path, zone):
+    with open(SOURCE) as f:
+        data = json.load(f)
+    for location in data['sample_locations']:
+        location['zone'] = zone
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    return str(path)
+
+def test_save_round_trip(tmp_path):
+    dataset = HeatDataset.from_json(SOURCE)
+    dataset.save(tmp_path / 'columnar')
+    loaded = HeatDataset.load(tmp_path / 'columnar')
+    
+    assert loaded.version == dataset.version
+    assert loaded.sample_locations() == dataset.sample_locations()
+
+def test_resave_keeps_mapped_columns_readable(tmp_path):
+    out = tmp_path / 'columnar'
+    HeatDataset.from_json(SOURCE).save(out)
+    mapped = HeatDataset.load(out)
+    before = (mapped.lats.copy(), mapped.zone_codes.copy())
+    
+    # Re-converting into the same directory must not truncate the mapped files
+    HeatDataset.from_json(_write_source(tmp_path / 'rural.json', 'rural')).save(out)
+    
+    assert np.array_equal(mapped.lats, before[0])
+    assert np.array_equal(mapped.zone_codes, before[1])
+    assert not any(name.endswith('.tmp') for name in map(str, out.iterdir()))
+
+def test_reload_invalidates_cached_lookups(tmp_path):
+    out = tmp_path / 'columnar'
+    HeatDataset.from_json(_write_source(tmp_path / 'urban.json', 'urban_high')).save(out)
+    processor = HeatDataProcessor(str(out), variation='none')
+    
+    assert processor.get_heat_data(19.076, 72.8777)['zone_type'] == 'urban_high'
+    
+    HeatDataset.from_json(_write_source(tmp_path / 'rural.json', 'rural')).save(out)
+    processor.reload()
+    
+    assert processor.get_heat_data(19.076, 72.8777)['zone_type'] == 'rural'
+
+def test_save_swaps_a_readable_columns_directory(tmp_path):
+    out = tmp_path / 'columnar'
+    first = HeatDataset.from_json(SOURCE).save(out)
+    second = HeatDataset.from_json(SOURCE).save(out)
+    
+    assert sorted(os.listdir(out)) == sorted([METADATA_FILE, second['columns_dir']])
+    assert second['columns_dir'] != first['columns_dir']
+    assert stat.S_IMODE(os.stat(out / METADATA_FILE).st_mode) == 0o644
+    assert stat.S_IMODE(os.stat(out / second['columns_dir']).st_mode) == 0o755
+
+def test_load_rejects_mismatched_flat_columns(tmp_path):
+    # Format 1 kept columns beside dataset.json and rewrote them one at a time
+    dataset = HeatDataset.from_json(SOURCE)
+    for column in ('lats', 'lngs', 'zone_codes'):
+        np.save(tmp_path / f'{column}.npy', getattr(dataset, column))
+    metadata = {'format': 1, 'version': dataset.version, 'count': len(dataset), 'heat_zones': dataset.heat_zones}
+    (tmp_path / METADATA_FILE).write_text(json.dumps(metadata))
+    
+    assert HeatDataset.load(tmp_path).sample_locations()[0]['lat'] == dataset.lats[0]
+    
+    np.save(tmp_path / 'lngs.npy', dataset.lngs[:-1])
+    with pytest.raises(ValueError):
+        HeatDataset.load(tmp_path)
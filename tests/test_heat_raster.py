@@ -0,0 +1,45 @@
+import json
+import os
+import stat
+import numpy as np
+from heat_data import HeatDataProcessor
+from heat_raster import HeatRasterPyramid, METADATA_FILE, build_pyramid
+
+BBOX = (18.9, 19.3, 72.7, 73.1)
+
+def test_pyramid_records_dataset_version(tmp_path):
+    processor = HeatDataProcessor(variation='none')
+    build_pyramid(processor, BBOX, str(tmp_path), resolution=0.01, levels=3)
+    pyramid = HeatRasterPyramid(str(tmp_path))
+    
+    assert pyramid.data_version == processor.data_version
+    assert len(pyramid.levels) == 3
+    assert stat.S_IMODE(os.stat(tmp_path / METADATA_FILE).st_mode) == 0o644
+    
+    grid = pyramid.heatmap_grid(19.076, 72.8777, as_array=True)
+    assert grid['intensity'].shape == (20, 20)
+
+def test_rebuild_keeps_open_pyramid_readable(tmp_path):
+    processor = HeatDataProcessor(variation='none')
+    build_pyramid(processor, BBOX, str(tmp_path), resolution=0.01, levels=2)
+    pyramid = HeatRasterPyramid(str(tmp_path))
+    before = np.array(pyramid.level_array(0))
+    
+    # Rebuilding into the same directory must not rewrite files the open pyramid maps
+    with open('data/sample_heat_data.json') as f:
+        data = json.load(f)
+    for location in data['sample_locations']:
+        location['zone'] = 'rural'
+    with open(tmp_path / 'rural.json', 'w') as f:
+        json.dump(data, f)
+    build_pyramid(HeatDataProcessor(str(tmp_path / 'rural.json'), variation='none'), BBOX, str(tmp_path),
+                  resolution=0.01, levels=2)
+    
+    assert np.array_equal(pyramid.level_array(0), before)
+    assert pyramid.changed()
+    
+    rebuilt = HeatRasterPyramid(str(tmp_path))
+    assert not rebuilt.changed()
+    assert rebuilt.data_version != pyramid.data_version
+    assert not np.array_equal(rebuilt.level_array(0), before)
+    assert len([name for name in os.listdir(tmp_path) if name.startswith('levels-')]) == 1
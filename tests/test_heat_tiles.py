@@ -0,0 +1,37 @@
+import os
+from heat_data import HeatDataProcessor
+from heat_tiles import HeatTileRenderer
+
+def test_interpolator_options_are_part_of_the_version(tmp_path):
+    near = HeatTileRenderer(HeatDataProcessor(variation='none', power=2.0), cache_dir=str(tmp_path))
+    far = HeatTileRenderer(HeatDataProcessor(variation='none', power=3.0), cache_dir=str(tmp_path))
+    
+    assert near.version != far.version
+    near.render_tile(3, 5, 3)
+    assert far.cached_tile(3, 5, 3) is None
+
+def test_deep_tiles_stay_in_memory(tmp_path):
+    renderer = HeatTileRenderer(HeatDataProcessor(variation='none'), cache_dir=str(tmp_path),
+                                sample_size=16, disk_max_zoom=3)
+    renderer.render_tile(3, 5, 3)
+    renderer.render_tile(4, 11, 7)
+    
+    tiles = [files for _, _, files in os.walk(tmp_path) if files]
+    assert tiles == [['3.png']]
+    assert renderer.cached_tile(4, 11, 7) is not None
+
+def test_sweep_removes_old_versions_and_oldest_tiles(tmp_path):
+    renderer = HeatTileRenderer(HeatDataProcessor(variation='none'), cache_dir=str(tmp_path), sample_size=16)
+    stale = tmp_path / 'old-version' / '3' / '5'
+    stale.mkdir(parents=True)
+    (stale / '3.png').write_bytes(b'png')
+    
+    for y, mtime in ((2, 100), (3, 200)):
+        renderer.render_tile(3, 5, y)
+        os.utime(renderer._path(renderer.version, 3, 5, y), (mtime, mtime))
+    renderer.max_disk_bytes = os.path.getsize(renderer._path(renderer.version, 3, 5, 3))
+    
+    assert renderer.sweep() == 1
+    assert os.listdir(tmp_path) == [renderer.version]
+    assert not os.path.exists(renderer._path(renderer.version, 3, 5, 2))
+    assert renderer.stats()['disk_files'] == 1
@@ -0,0 +1,54 @@
+import os
+import stat
+import numpy as np
+import pytest
+from heat_data import HeatDataProcessor
+from heat_timeseries import METADATA_FILE, TimeSeriesStore, parse_time
+
+SOURCE = 'data/sample_heat_data.json'
+START = '2024-05-01T00:00'
+LAT, LNG = 19.076, 72.8777  # Sample 0
+
+def _processor(tmp_path):
+    store = TimeSeriesStore.create(str(tmp_path / 'series'), 4, START)
+    store.append(START, np.full((2, 4), 30.0, dtype=np.float32))
+    return store, HeatDataProcessor(SOURCE, variation='none', timeseries=str(tmp_path / 'series'))
+
+def test_lookup_uses_stored_reading(tmp_path):
+    _, processor = _processor(tmp_path)
+    result = processor.get_heat_data(LAT, LNG, at='2024-05-01T01:30')
+    
+    assert result['temperature'] == 30.0
+    assert result['time'] == '2024-05-01T01:00:00Z'
+
+def test_cached_lookup_sees_appended_hours(tmp_path):
+    store, processor = _processor(tmp_path)
+    before = processor.get_heat_data(LAT, LNG, at='2024-05-01T02:00')
+    
+    # Another process appends the hour that was missing when it was cached
+    TimeSeriesStore(store.path).append('2024-05-01T02:00', np.full((1, 4), 45.0, dtype=np.float32))
+    after = processor.get_heat_data(LAT, LNG, at='2024-05-01T02:00')
+    fresh = HeatDataProcessor(SOURCE, variation='none', timeseries=store.path).get_heat_data(
+        LAT, LNG, at='2024-05-01T02:00'
+    )
+    
+    assert before['temperature'] != 45.0
+    assert after == fresh
+    assert after['temperature'] == 45.0
+
+def test_values_are_clamped_to_stored_hours(tmp_path):
+    store, _ = _processor(tmp_path)
+    times, values = store.values([0, 3], '2024-04-30T00:00', '2024-05-02T00:00')
+    
+    assert times.tolist() == [parse_time(START), parse_time(START) + 3600]
+    assert values.shape == (2, 2) and np.all(values == 30.0)
+
+def test_metadata_is_world_readable(tmp_path):
+    store, _ = _processor(tmp_path)
+    
+    assert stat.S_IMODE(os.stat(os.path.join(store.path, METADATA_FILE)).st_mode) == 0o644
+
+@pytest.mark.parametrize('value', [float('inf'), float('nan'), 'inf', '-Infinity', 'nan'])
+def test_parse_time_rejects_non_finite(value):
+    with pytest.raises(ValueError):
+        parse_time(value)
@@ -0,0 +1,25 @@
+import numpy as np
+from image_features import FeatureAccumulator, LUMA_WEIGHTS, luma
+
+def _reference_luma(image):
+    weights = np.array(LUMA_WEIGHTS, dtype=np.int64)
+    return (image.astype(np.int64) @ weights >> 8).astype(np.uint8)
+
+def test_luma_of_solid_grey():
+    assert np.all(luma(np.full((4, 4, 3), 200, dtype=np.uint8)) == 200)
+
+def test_luma_matches_integer_reference():
+    image = np.random.default_rng(0).integers(0, 256, (64, 48, 3), dtype=np.uint8)
+    assert np.array_equal(luma(image), _reference_luma(image))
+
+def test_strips_match_a_single_pass():
+    image = np.random.default_rng(1).integers(0, 256, (37, 29, 3), dtype=np.uint8)
+    whole = FeatureAccumulator(29, 37)
+    whole.update(image)
+    strips = FeatureAccumulator(29, 37)
+    for top in range(0, 37, 8):
+        strips.update(image[top:top + 8])
+    
+    expected, actual = whole.result(), strips.result()
+    assert np.array_equal(expected.pop('luminance_histogram'), actual.pop('luminance_histogram'))
+    assert actual == expected
@@ -0,0 +1,57 @@
+import itertools
+import json
+from recommendations import RecommendationEngine, RuleSet, DEFAULT_RULES_FILE
+from legacy_recommendations import LegacyRecommendationEngine
+
+# Every threshold the legacy engine tests, with values either side of it
+HEAT_INDICES = (0.0, 0.3, 0.5, 0.55, 0.6, 0.65, 0.7, 0.72, 0.75, 0.8, 0.85, 1.0)
+TEMPERATURES = (30.0, 36.0, 36.1, 40.0)
+FEATURES = [None, {}] + [
+    {
+        'heat_absorption': absorption,
+        'estimated_size': size,
+        'design_quality': design,
+        'size_factor': factor,
+        'absorption_factor': factor,
+        'design_factor': 2.0 - factor
+    }
+    for absorption, size, design, factor in itertools.product(
+        ('high', 'low'), ('large', 'small'), ('basic', 'good'), (0.6, 1.0, 1.4)
+    )
+]
+
+def _as_json(result):
+    # RuleSet shares tuples where the legacy engine built lists; clients see the same JSON
+    return json.loads(json.dumps(result))
+
+def _heat_data(heat_index, temperature):
+    return {'heat_index': heat_index, 'temperature': temperature, 'risk_level': 'HIGH'}
+
+def test_rules_match_legacy_engine():
+    engine = RecommendationEngine()
+    legacy = LegacyRecommendationEngine()
+    
+    for heat_index, temperature, features in itertools.product(HEAT_INDICES, TEMPERATURES, FEATURES):
+        heat_data = _heat_data(heat_index, temperature)
+        assert _as_json(engine.generate_recommendations(heat_data, features)) == \
+            _as_json(legacy.generate_recommendations(heat_data, features)), (heat_data, features)
+
+def test_memo_is_bounded_by_predicate_outcomes():
+    rules = RuleSet.from_file(DEFAULT_RULES_FILE)
+    for i in range(2000):
+        rules.apply({
+            'heat_index': i / 2000,
+            'temperature': 30 + i / 100,
+            'score': i % 101,
+            'risk_level': 'LOW',
+            'features': {'heat_absorption': f'label-{i}', 'estimated_size': i}
+        })
+    
+    assert rules.stats()['size'] < 64
+    assert rules.memo_hits > 1900
+
+def test_unhashable_feature_values_do_not_match():
+    rules = RuleSet.from_file(DEFAULT_RULES_FILE)
+    context = {'heat_index': 0.2, 'temperature': 30.0, 'score': 90, 'features': {'heat_absorption': ['high']}}
+    
+    assert 'reflective_materials' not in rules.fired_ids(context)['recommendations']
@@ -0,0 +1,221 @@
+import io
+import json
+import os
+import threading
+import numpy as np
+import pytest
+from heat_data import HeatDataProcessor
+from heat_raster import build_pyramid
+from heat_timeseries import TimeSeriesStore
+from suitability_index import build_index
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    root = tmp_path_factory.mktemp('server')
+    build_index((19.0, 19.1, 72.8, 72.9), str(root / 'suitability'), resolution=0.005, workers=1)
+    build_pyramid(HeatDataProcessor(), (18.9, 19.3, 72.7, 73.1), str(root / 'raster'), resolution=0.005, levels=3)
+    store = TimeSeriesStore.create(str(root / 'timeseries'), 4, '2024-05-01T00:00')
+    store.append('2024-05-01T00:00', np.full((24, 4), 36.0, dtype=np.float32))
+    os.environ.update({
+        'UPLOAD_FOLDER': str(root / 'uploads'),
+        'UPLOAD_SWEEP_INTERVAL': '0',
+        'DATA_WATCH_INTERVAL': '0',
+        'TILE_CACHE_FOLDER': str(root / 'tiles'),
+        'HEAT_TIMESERIES_PATH': str(root / 'timeseries'),
+        'HEAT_RASTER_PATH': str(root / 'raster'),
+        'SUITABILITY_INDEX_PATH': str(root / 'suitability')
+    })
+    import server
+    return server.app.test_client()
+
+def _rows(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def test_score_sites_streams_rows(client):
+    response = client.post('/api/score-sites', json={
+        'latitudes': [19.076, 12.9716],
+        'longitudes': [72.8777, 77.5946],
+        'building_features': {'size_factor': 1.2, 'heat_absorption': 'high'},
+        'detail': [1]
+    })
+    rows = _rows(response)
+    
+    assert response.status_code == 200
+    assert rows[0]['count'] == 2
+    assert len(rows[1]) == len(rows[2]) == 3
+    assert rows[3]['index'] == 1
+
+def test_score_sites_csv(client):
+    response = client.post('/api/score-sites', data='lat,lng,size_factor\n19.076,72.8777,1.5\n',
+                           content_type='text/csv')
+    assert response.status_code == 200
+    assert _rows(response)[0]['count'] == 1
+
+@pytest.mark.parametrize('body', [
+    {'latitudes': [19.0], 'longitudes': [72.8], 'building_features': 'abc'},
+    {'latitudes': [19.0], 'longitudes': [72.8], 'building_features': {'size_factor': 'big'}},
+    {'latitudes': [19.0], 'longitudes': [72.8], 'building_features': [{'size_factor': None}]},
+    {'latitudes': [19.0], 'longitudes': [72.8], 'building_features': {'heat_absorption': ['x']}, 'detail': [0]},
+    {'latitudes': 5, 'longitudes': [72.8]},
+    {'latitudes': '19', 'longitudes': '72'},
+    {'latitudes': [float('nan')], 'longitudes': [72.8]},
+    {'latitudes': [19.0], 'longitudes': [float('inf')]},
+    {'latitudes': [None], 'longitudes': [72.8]},
+    {'latitudes': [19.0], 'longitudes': [72.8], 'detail': 0},
+    {'latitudes': [19.0, 20.0], 'longitudes': [72.8]},
+    []
+])
+def test_score_sites_rejects_malformed_bodies(client, body):
+    response = client.post('/api/score-sites', data=json.dumps(body), content_type='application/json')
+    
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_score_sites_rejects_malformed_csv(client):
+    response = client.post('/api/score-sites', data='lat,lng\nnan,72.8\n', content_type='text/csv')
+    assert response.status_code == 400
+
+def test_cached_tiles_skip_the_pools(client):
+    import server
+    first = client.get('/api/heat-tiles/3/5/3.png')
+    renders = server.tile_pool.stats()
+    
+    # With every analysis and tile slot taken, a cached tile is still served
+    release = threading.Event()
+    for pool in (server.analysis_pool, server.tile_pool):
+        for _ in range(pool.max_workers + pool.max_queue):
+            pool.submit(release.wait)
+    try:
+        second = client.get('/api/heat-tiles/3/5/3.png')
+    finally:
+        release.set()
+    
+    assert first.status_code == second.status_code == 200
+    assert first.mimetype == 'image/png' and second.data == first.data
+    assert server.tile_pool.stats()['rejected'] == renders['rejected']
+
+def test_suitability_point(client):
+    response = client.get('/api/suitability?lat=19.05&lng=72.85')
+    
+    assert response.status_code == 200
+    assert set(response.get_json()['scores']) >= {'default'}
+
+@pytest.mark.parametrize('query', [
+    'lat=nan&lng=72.85', 'lat=19.05&lng=inf', 'lat=-inf&lng=72.85', 'lat=abc&lng=72.85', 'lat=19.05'
+])
+def test_suitability_point_rejects_bad_coordinates(client, query):
+    response = client.get(f'/api/suitability?{query}')
+    
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_suitability_top(client):
+    response = client.get('/api/suitability/top?lat_min=19&lat_max=19.1&lng_min=72.8&lng_max=72.9&n=3')
+    cells = response.get_json()['cells']
+    
+    assert response.status_code == 200
+    assert len(cells) == 3
+    assert [cell['score'] for cell in cells] == sorted((cell['score'] for cell in cells), reverse=True)
+
+@pytest.mark.parametrize('query', [
+    'lat_min=nan&lat_max=19.1&lng_min=72.8&lng_max=72.9',
+    'lat_min=19&lat_max=inf&lng_min=72.8&lng_max=72.9',
+    'lat_min=19&lat_max=19.1&lng_min=-inf&lng_max=72.9',
+    'lat_min=19&lat_max=19.1&lng_min=72.8&lng_max=72.9&n=0',
+    'lat_min=19&lat_max=19.1&lng_min=72.8'
+])
+def test_suitability_top_rejects_bad_boxes(client, query):
+    response = client.get(f'/api/suitability/top?{query}')
+    
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_analyze_location(client):
+    response = client.post('/api/analyze-location', json={'latitude': 19.076, 'longitude': 72.8777})
+    
+    assert response.status_code == 200
+    assert response.get_json()['heat_data']['zone_type'] == 'urban_high'
+
+@pytest.mark.parametrize('body', [
+    {'latitude': float('nan'), 'longitude': 72.8777},
+    {'latitude': 19.076, 'longitude': float('inf')},
+    {'latitude': 'north', 'longitude': 72.8777},
+    {'latitude': 19.076, 'longitude': 72.8777, 'time': float('inf')}
+])
+def test_analyze_location_rejects_bad_input(client, body):
+    response = client.post('/api/analyze-location', data=json.dumps(body), content_type='application/json')
+    
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_heat_timeseries(client):
+    response = client.get('/api/heat-timeseries?lat=19.076&lng=72.8777&start=2024-05-01&end=2024-05-02')
+    
+    assert response.status_code == 200
+    assert response.get_json()['max'] == 36.0
+
+@pytest.mark.parametrize('query', [
+    'lat=nan&lng=72.8777&start=2024-05-01&end=2024-05-02',
+    'lat=19.076&lng=inf&start=2024-05-01&end=2024-05-02',
+    'lat=19.076&lng=72.8777&start=2024-05-01&end=inf',
+    'lat=19.076&lng=72.8777&start=2024-05-01&end=2024-05-02&threshold=nan'
+])
+def test_heat_timeseries_rejects_bad_input(client, query):
+    response = client.get(f'/api/heat-timeseries?{query}')
+    
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_heat_raster_window(client):
+    response = client.get('/api/heat-raster?lat_min=19&lat_max=19.1&lng_min=72.8&lng_max=72.9')
+    body = response.get_json()
+    
+    assert response.status_code == 200
+    assert body['stale'] is False and min(body['shape']) >= 20
+
+@pytest.mark.parametrize('query', [
+    'lat_min=nan&lat_max=19.1&lng_min=72.8&lng_max=72.9',
+    'lat_min=19&lat_max=inf&lng_min=72.8&lng_max=72.9',
+    'lat_min=19&lat_max=19.1&lng_min=72.8'
+])
+def test_heat_raster_rejects_bad_boxes(client, query):
+    response = client.get(f'/api/heat-raster?{query}')
+    
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_location_grid_ignores_raster_from_other_dataset(client, monkeypatch):
+    import server
+    raster = server.current_heat_raster()
+    processor_grid = server.heat_processor.generate_heatmap_grid(19.076, 72.8777, as_array=True)
+    
+    assert np.array_equal(server.analyze_coordinates(19.076, 72.8777)['heatmap_data']['intensity'],
+                          raster.heatmap_grid(19.076, 72.8777, as_array=True)['intensity'])
+    
+    monkeypatch.setattr(raster, 'data_version', 'another-dataset')
+    grid = server.analyze_coordinates(19.076, 72.8777)['heatmap_data']
+    
+    assert np.array_equal(grid['intensity'], processor_grid['intensity'])
+
+def test_upload_batch_rows(client, monkeypatch):
+    import server
+    monkeypatch.setattr(server, 'BATCH_WORKERS', 1)
+    monkeypatch.setitem(server.app.config, 'MAX_CONTENT_LENGTH', 16)
+    response = client.post('/api/upload-batch', data={'building_images': [
+        (io.BytesIO(b'not an image' * 4), 'roof.png'),
+        (io.BytesIO(b'text'), 'notes.txt')
+    ]}, content_type='multipart/form-data')
+    rows = sorted(_rows(response), key=lambda row: row['filename'])
+    
+    # Larger than the global request limit, but within the batch route's own
+    assert response.status_code == 200
+    assert all(row['cached'] is False and row['success'] is False for row in rows)
+    assert rows[1]['error'] == 'Failed to analyze image'
+    
+    def disk_full(*args, **kwargs):
+        raise OSError('No space left on device')
+    
+    monkeypatch.setattr(server.upload_store, 'ingest', disk_full)
+    rows = _rows(client.post('/api/upload-batch', data={'building_images': [(io.BytesIO(b'x'), 'roof.png')]},
+                             content_type='multipart/form-data'))
+    assert rows == [{'filename': 'roof.png', 'cached': False, 'success': False, 'error': 'Failed to store image'}]
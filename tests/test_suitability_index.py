@@ -0,0 +1,54 @@
+import math
+import numpy as np
+import pytest
+from suitability_index import SuitabilityIndex, SCORE_SCALE, build_index
+
+BBOX = (18.9, 19.2, 72.7, 72.95)  # 301 x 250 cells, several tiles each way
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('suitability'))
+    build_index(BBOX, path, resolution=0.001, workers=1)
+    return SuitabilityIndex(path)
+
+def _brute_force_top(index, lat_min, lat_max, lng_min, lng_max, n, profile):
+    """Every cell in the box, best score first, then southern, then western"""
+    r0 = max(0, math.floor((lat_min - index.lat_min) / index.resolution))
+    c0 = max(0, math.floor((lng_min - index.lng_min) / index.resolution))
+    r1 = min(index.rows, math.ceil((lat_max - index.lat_min) / index.resolution))
+    c1 = min(index.cols, math.ceil((lng_max - index.lng_min) / index.resolution))
+    scores = np.asarray(index.scores[profile])
+    
+    cells = sorted((-int(scores[row, col]), row, col) for row in range(r0, r1) for col in range(c0, c1))
+    return [(row, col, -score / SCORE_SCALE) for score, row, col in cells[:n]]
+
+def _positions(index, cells):
+    return [
+        (round((cell['lat'] - index.lat_min) / index.resolution - 0.5),
+         round((cell['lng'] - index.lng_min) / index.resolution - 0.5),
+         cell['score'])
+        for cell in cells
+    ]
+
+@pytest.mark.parametrize('box, n', [
+    ((18.9, 19.2, 72.7, 72.95), 10),
+    ((18.95, 19.15, 72.75, 72.9), 1),
+    ((18.95, 19.15, 72.75, 72.9), 250),
+    ((19.0, 19.003, 72.8, 72.802), 50),
+    ((18.0, 19.0, 72.0, 72.8), 25)
+])
+def test_top_matches_brute_force(index, box, n):
+    for profile in index.profiles:
+        assert _positions(index, index.top(*box, n, profile)) == _brute_force_top(index, *box, n, profile)
+
+def test_top_outside_coverage(index):
+    assert index.top(10.0, 11.0, 70.0, 71.0) is None
+
+def test_point_matches_stored_cell(index):
+    cell = index.point(19.0765, 72.8775)
+    row = math.floor((19.0765 - index.lat_min) / index.resolution)
+    col = math.floor((72.8775 - index.lng_min) / index.resolution)
+    
+    assert cell['scores']['default'] == int(index.scores['default'][row, col]) / SCORE_SCALE
+    assert index.point(25.0, 72.8) is None
+    assert index.point(float('nan'), 72.8) is None
@@ -0,0 +1,35 @@
+import threading
+import pytest
+from task_pool import BoundedExecutor, ServerBusy
+
+def test_rejects_beyond_queue():
+    pool = BoundedExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+    pool.submit(release.wait)
+    pool.submit(release.wait)
+    
+    with pytest.raises(ServerBusy):
+        pool.submit(release.wait)
+    assert pool.stats()['rejected'] == 1
+    
+    release.set()
+    pool.shutdown()
+
+def test_timeout_cancels_queued_job_and_frees_its_slot():
+    pool = BoundedExecutor(max_workers=1, max_queue=1, timeout=0.05)
+    release = threading.Event()
+    ran = []
+    pool.submit(release.wait)
+    
+    with pytest.raises(ServerBusy):
+        pool.run(ran.append, 'abandoned')
+    
+    # The abandoned job gave its queue slot back and never runs
+    assert pool.stats()['queued'] == 0
+    queued = pool.submit(ran.append, 'next')
+    release.set()
+    queued.result(timeout=1)
+    pool.shutdown()
+    
+    assert ran == ['next']
+    assert pool.stats()['timed_out'] == 1
@@ -0,0 +1,83 @@
+import io
+import os
+import threading
+import time
+import upload_store
+from upload_store import UploadStore
+
+def _age(path, seconds):
+    moment = time.time() - seconds
+    os.utime(path, (moment, moment))
+
+def test_ingest_deduplicates(tmp_path):
+    store = UploadStore(str(tmp_path))
+    first = store.ingest(io.BytesIO(b'roof'))
+    second = store.ingest(io.BytesIO(b'roof'))
+    
+    assert first.created and not second.created
+    assert first.path == second.path == store.path(first.digest)
+    assert second.buffer.read() == b'roof'
+    assert (store.stored, store.deduplicated) == (1, 1)
+    assert os.listdir(os.path.join(str(tmp_path), upload_store.TEMP_DIR)) == []
+
+def test_sweep_evicts_by_age_then_size(tmp_path):
+    store = UploadStore(str(tmp_path), max_bytes=10, max_age=3600)
+    expired = store.ingest(io.BytesIO(b'expired'))
+    oldest = store.ingest(io.BytesIO(b'oldest'))
+    newest = store.ingest(io.BytesIO(b'newest'))
+    _age(expired.path, 7200)
+    _age(oldest.path, 60)
+    
+    assert store.sweep() == 2
+    assert not os.path.exists(expired.path) and not os.path.exists(oldest.path)
+    assert os.path.exists(newest.path)
+    assert (store.files, store.bytes) == (1, 6)
+
+def test_sweep_prunes_only_stale_shard_directories(tmp_path):
+    store = UploadStore(str(tmp_path), max_age=3600)
+    upload = store.ingest(io.BytesIO(b'old'))
+    _age(upload.path, 7200)
+    store.sweep()
+    shard = os.path.dirname(upload.path)
+    
+    assert os.path.isdir(shard)  # Just emptied, still within the grace period
+    
+    _age(shard, upload_store.SHARD_GRACE + 1)
+    store.sweep()
+    
+    assert not os.path.exists(shard)
+
+def test_concurrent_ingest_and_sweep(tmp_path, monkeypatch):
+    # No grace period, so sweepers prune shard directories as eagerly as they can
+    monkeypatch.setattr(upload_store, 'SHARD_GRACE', 0)
+    root = str(tmp_path)
+    errors = []
+    done = threading.Event()
+    
+    def ingest(worker):
+        store = UploadStore(root)
+        try:
+            for i in range(300):
+                store.ingest(io.BytesIO(f'{worker}-{i}'.encode()), in_memory=False)
+        except Exception as e:
+            errors.append(e)
+    
+    def sweep():
+        store = UploadStore(root, max_bytes=64)
+        try:
+            while not done.is_set():
+                store.sweep()
+        except Exception as e:
+            errors.append(e)
+    
+    sweepers = [threading.Thread(target=sweep) for _ in range(2)]
+    ingesters = [threading.Thread(target=ingest, args=(worker,)) for worker in range(3)]
+    for thread in sweepers + ingesters:
+        thread.start()
+    for thread in ingesters:
+        thread.join()
+    done.set()
+    for thread in sweepers:
+        thread.join()
+    
+    assert errors == []
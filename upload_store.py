@@ -0,0 +1,222 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+TEMP_DIR = 'tmp'
+TEMP_MAX_AGE = 60 * 60  # Partial writes left by a crashed worker are swept after this many seconds
+
+# Shard directories younger than this are never pruned, so an ingest that just
+# created one can still rename its file into it
+SHARD_GRACE = 60
+COMMIT_ATTEMPTS = 8
+
+# digest: SHA-256 hex; buffer: the bytes rewound in memory, or None when not kept
+StoredUpload = namedtuple('StoredUpload', 'digest path size buffer created')
+
+def _is_shard(name):
+    return len(name) == 2 and all(c in '0123456789abcdef' for c in name)
+
+def _prune(directory):
+    """Remove an empty shard directory unless it is still within SHARD_GRACE; True if removed"""
+    try:
+        if os.stat(directory).st_mtime > time.time() - SHARD_GRACE:
+            return False
+        os.rmdir(directory)
+        return True
+    except OSError:
+        return False  # Not empty, or already gone
+
+class UploadStore:
+    """
+    Content-addressed upload storage with bounded disk use
+    ingest() reads an upload stream once, hashing each chunk as it is written
+    to a temporary file (and kept in memory for the analyzer), then renames
+    the file to root/ab/cd/<sha256>, so identical uploads share one file and
+    names never collide. A daemon sweeper thread removes files older than
+    max_age seconds, then the least recently stored ones until the store
+    fits in max_bytes, and prunes empty shard directories once they have
+    been left unchanged for SHARD_GRACE seconds. Storing an existing digest
+    again refreshes its mtime, so re-uploads are kept longest.
+    """
+    
+    def __init__(self, root, max_bytes=None, max_age=None, sweep_interval=60.0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.sweep_interval = sweep_interval
+        self.stored = 0
+        self.deduplicated = 0
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.files = None
+        self.bytes = None
+        self.last_sweep_at = None
+        self.last_error = None
+        self._temp_dir = os.path.join(root, TEMP_DIR)
+        self._stopped = threading.Event()
+        self._thread = None
+        os.makedirs(self._temp_dir, exist_ok=True)
+    
+    def start(self):
+        if self._thread is None and self.sweep_interval:
+            self._thread = threading.Thread(target=self._run, name='upload-sweeper', daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stopped.set()
+    
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+    
+    def ingest(self, stream, in_memory=True, chunk_size=HASH_CHUNK_SIZE):
+        """
+        Store an upload stream, reading it exactly once
+        Returns a StoredUpload; created is False when the content was already
+        stored. With in_memory, buffer is a BytesIO of the bytes at offset 0.
+        """
+        digest = hashlib.sha256()
+        buffer = io.BytesIO() if in_memory else None
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self._temp_dir)
+        
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: stream.read(chunk_size), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    if buffer is not None:
+                        buffer.write(chunk)
+                    size += len(chunk)
+            
+            path = self.path(digest.hexdigest())
+            created = self._commit(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        
+        if buffer is not None:
+            buffer.seek(0)
+        return StoredUpload(digest.hexdigest(), path, size, buffer, created)
+    
+    def _commit(self, temp_path, path):
+        """Move a finished temporary file into place; False if the content already existed"""
+        try:
+            os.utime(path)
+            os.remove(temp_path)
+            self.deduplicated += 1
+            return False
+        except FileNotFoundError:
+            pass
+        
+        for attempt in range(COMMIT_ATTEMPTS):
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+                break
+            except FileNotFoundError:
+                # Another process's sweeper pruned a shard directory in between; recreate it
+                if attempt == COMMIT_ATTEMPTS - 1:
+                    raise
+        
+        self.stored += 1
+        return True
+    
+    def _run(self):
+        while not self._stopped.wait(self.sweep_interval):
+            try:
+                self.sweep()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f'{type(e).__name__}: {e}'
+    
+    def _scan(self, directory, depth, entries):
+        """Collect (mtime, size, path) of stored files, removing shard directories left empty"""
+        try:
+            with os.scandir(directory) as items:
+                for item in items:
+                    try:
+                        if depth and item.is_dir(follow_symlinks=False) and _is_shard(item.name):
+                            self._scan(item.path, depth - 1, entries)
+                        elif not depth and item.is_file(follow_symlinks=False):
+                            stat = item.stat(follow_symlinks=False)
+                            entries.append((stat.st_mtime, stat.st_size, item.path))
+                    except FileNotFoundError:
+                        pass  # Evicted or pruned by another sweeper mid-scan
+        except FileNotFoundError:
+            return
+        
+        if directory != self.root:
+            _prune(directory)
+    
+    def _remove(self, path, size):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return  # Another worker's sweeper got there first
+        self.evicted_files += 1
+        self.evicted_bytes += size
+        # Emptied shard directories are pruned by a later sweep, once past SHARD_GRACE
+    
+    def sweep(self):
+        """Evict by age, then oldest-first by total size; returns the files evicted"""
+        now = time.time()
+        evicted = self.evicted_files
+        entries = []
+        self._scan(self.root, 2, entries)
+        
+        with os.scandir(self._temp_dir) as items:
+            for item in items:
+                try:
+                    if item.is_file(follow_symlinks=False) and item.stat().st_mtime < now - TEMP_MAX_AGE:
+                        os.remove(item.path)
+                except FileNotFoundError:
+                    pass  # Renamed into the store, or removed, since the listing
+        
+        entries.sort()
+        if self.max_age:
+            cutoff = now - self.max_age
+            expired = next((i for i, entry in enumerate(entries) if entry[0] >= cutoff), len(entries))
+            for _, size, path in entries[:expired]:
+                self._remove(path, size)
+            entries = entries[expired:]
+        
+        total = sum(size for _, size, _ in entries)
+        if self.max_bytes:
+            oldest = 0
+            while total > self.max_bytes and oldest < len(entries):
+                _, size, path = entries[oldest]
+                self._remove(path, size)
+                total -= size
+                oldest += 1
+            entries = entries[oldest:]
+        
+        self.files = len(entries)
+        self.bytes = total
+        self.last_sweep_at = now
+        return self.evicted_files - evicted
+    
+    def stats(self):
+        """Ingest and eviction counters; files and bytes are as of the last sweep"""
+        return {
+            'files': self.files,
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'max_age': self.max_age,
+            'stored': self.stored,
+            'deduplicated': self.deduplicated,
+            'evicted_files': self.evicted_files,
+            'evicted_bytes': self.evicted_bytes,
+            'last_sweep_at': self.last_sweep_at,
+            'last_error': self.last_error,
+            'sweep_interval': self.sweep_interval
+        }